@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Product.settings')
+# Product and user reads use the async ORM when served over ASGI.
+os.environ.setdefault('ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
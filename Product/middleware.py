@@ -1,7 +1,176 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
 from django.utils.deprecation import MiddlewareMixin
 
+from services.base.services import unit_of_work_scope
+from services.db.pool import export_pool_stats
+from services.db.routers import RoutingState, routing_state
+from services.metrics.metrics import (
+    REQUEST_LATENCY,
+    REQUEST_N_PLUS_ONE,
+    REQUEST_SQL_DURATION,
+    REQUEST_SQL_QUERIES,
+    RESPONSE_SIZE,
+)
+from services.metrics.queries import QueryLog, install_query_recorder, query_log
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
 
 class DisableCSRFMiddleware(MiddlewareMixin):
 
     def process_request(self, request):
         setattr(request, '_dont_enforce_csrf_checks', True)
+
+
+class UnitOfWorkMiddleware:
+    """Gives every request its own identity map, see ``services.base.services.UnitOfWork``."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with unit_of_work_scope():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with unit_of_work_scope():
+            return await self.get_response(request)
+
+
+class ReplicaPinMiddleware:
+    """Sets up replica routing for each request and pins clients that wrote to the primary.
+
+    After a write the client reads from the primary for ``REPLICA_PIN_SECONDS``
+    so it sees its own writes despite replication lag. The pin travels in a
+    signed cookie, so every worker process and server sees it.
+    """
+    sync_capable = True
+    async_capable = True
+
+    cookie_name = 'db_pin'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        state = RoutingState(pinned=request.method not in SAFE_METHODS or self.is_pinned(request))
+        token = routing_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            routing_state.reset(token)
+        if state.wrote:
+            self.pin(response)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return await self.get_response(request)
+        state = RoutingState(pinned=request.method not in SAFE_METHODS or self.is_pinned(request))
+        token = routing_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            routing_state.reset(token)
+        if state.wrote:
+            self.pin(response)
+        return response
+
+    def is_pinned(self, request) -> bool:
+        # The signature carries a timestamp, an older or forged cookie is ignored.
+        return request.get_signed_cookie(
+            self.cookie_name, default=None, salt=self.cookie_name, max_age=settings.REPLICA_PIN_SECONDS
+        ) is not None
+
+    def pin(self, response) -> None:
+        response.set_signed_cookie(
+            self.cookie_name, '1', salt=self.cookie_name,
+            max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax',
+        )
+
+
+class RequestMetricsMiddleware:
+    """Records latency, SQL statement count and time, and response size per route.
+
+    Routes are URL names such as ``product-list``. A request that runs one
+    query shape ``N_PLUS_ONE_THRESHOLD`` times or more is counted and logged
+    as a probable N+1.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        self.install_query_recorders()
+        log = QueryLog()
+        token = query_log.set(log)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            query_log.reset(token)
+        self.observe(request, response, time.perf_counter() - started, log)
+        return response
+
+    async def __acall__(self, request):
+        self.install_query_recorders()
+        log = QueryLog()
+        token = query_log.set(log)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            query_log.reset(token)
+        self.observe(request, response, time.perf_counter() - started, log)
+        return response
+
+    @staticmethod
+    def install_query_recorders() -> None:
+        # Covers connections of this thread opened before the recorder was
+        # imported, later ones get it from the connection_created hook.
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+
+    @staticmethod
+    def observe(request, response, duration: float, log: QueryLog) -> None:
+        match = request.resolver_match
+        route = match.view_name if match else 'unmatched'
+        REQUEST_LATENCY.labels(route, request.method, response.status_code).observe(duration)
+        REQUEST_SQL_QUERIES.labels(route).observe(log.count)
+        REQUEST_SQL_DURATION.labels(route).observe(log.duration)
+        # Streamed bodies are not buffered, so their size is unknown here.
+        if not response.streaming:
+            RESPONSE_SIZE.labels(route).observe(len(response.content))
+
+        export_pool_stats()
+
+        repeated = log.repeated(settings.N_PLUS_ONE_THRESHOLD)
+        if repeated:
+            REQUEST_N_PLUS_ONE.labels(route).inc()
+            sql, count = repeated[0]
+            logger.warning('Probable N+1 on %s %s: %d statements like %s', request.method, route, count, sql)
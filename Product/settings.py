@@ -9,12 +9,12 @@ https://docs.djangoproject.com/en/5.1/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
+import copy
 import os
 from datetime import timedelta
 from pathlib import Path
 
-from rest_framework.pagination import LimitOffsetPagination
-from rest_framework.response import Response
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -42,6 +42,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     # libraries
     'rest_framework',
     'drf_yasg',
@@ -56,11 +57,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'Product.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     # 'django.middleware.csrf.CsrfViewMiddleware',
     "Product.middleware.DisableCSRFMiddleware",
+    'Product.middleware.ReplicaPinMiddleware',
+    'Product.middleware.UnitOfWorkMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
@@ -92,17 +96,92 @@ WSGI_APPLICATION = 'Product.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Minimum trigram similarity for the `name_fuzzy` products filter (0..1).
+# Also sent as pg_trgm.similarity_threshold so the indexed `%` operator agrees.
+PRODUCT_FUZZY_THRESHOLD = float(os.getenv('PRODUCT_FUZZY_THRESHOLD', '0.3'))
+
+# Keep a psycopg 3 connection pool per process instead of connecting per request.
+# Sizes are per process: DB_POOL_MAX_SIZE times the number of workers must stay
+# below the server's max_connections.
+DB_POOL = os.getenv('DB_POOL', 'True') == 'True'
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'ENGINE': 'django.db.backends.postgresql',
         'NAME': os.getenv('POSTGRES_DB', 'your_default_db_name'),
         'USER': os.getenv('POSTGRES_USER', 'your_default_db_user'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'your_default_password'),
         'HOST': os.getenv('POSTGRES_HOST', 'localhost'),
         'PORT': os.getenv('POSTGRES_PORT', '5432'),
+        # Persistent connections are only used without the pool, which replaces them.
+        'CONN_MAX_AGE': 0 if DB_POOL else int(os.getenv('DB_CONN_MAX_AGE', '0')),
+        # With the pool this checks every connection with a round trip before handing it out.
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'options': f'-c pg_trgm.similarity_threshold={PRODUCT_FUZZY_THRESHOLD}',
+        },
+    }
+}
+
+if DB_POOL:
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+        'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '8')),
+        # Seconds before a connection is replaced, and an idle one above min_size closed.
+        'max_lifetime': float(os.getenv('DB_POOL_MAX_LIFETIME', '1800')),
+        'max_idle': float(os.getenv('DB_POOL_MAX_IDLE', '300')),
+        # Seconds a request waits for a free connection before failing.
+        'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+    }
+
+# Read replicas as comma separated `host[:port][/name]`, e.g. `replica-1,replica-2:5433`.
+# Unset fields are taken from the primary. For local testing a second database on the
+# same server works as a stand-in: `POSTGRES_REPLICAS=localhost/product_replica`.
+DATABASE_REPLICAS = []
+for _index, _replica in enumerate(filter(None, os.getenv('POSTGRES_REPLICAS', '').split(',')), start=1):
+    _location, _, _name = _replica.strip().partition('/')
+    _host, _, _port = _location.partition(':')
+    DATABASES[f'replica{_index}'] = {
+        **copy.deepcopy(DATABASES['default']),
+        'HOST': _host or DATABASES['default']['HOST'],
+        'PORT': _port or DATABASES['default']['PORT'],
+        'NAME': _name or DATABASES['default']['NAME'],
+        # Tests read through the replica aliases from the primary's test database.
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{_index}')
+
+DATABASE_ROUTERS = ['services.db.routers.PrimaryReplicaRouter']
+
+# Seconds a client that wrote keeps reading from the primary.
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', '5'))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Redis is shared by every worker process, so they see the same entries and
+# counters. The local-memory cache is only fit for a single process in DEBUG.
+
+LOCAL_MEMORY_CACHE = 'django.core.cache.backends.locmem.LocMemCache'
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.redis.RedisCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'redis://localhost:6379/0'),
     }
 }
 
+# Cache alias and lifetime (seconds) of cached product list/retrieve responses.
+PRODUCT_CACHE_ALIAS = os.getenv('PRODUCT_CACHE_ALIAS', 'default')
+PRODUCT_CACHE_TIMEOUT = int(os.getenv('PRODUCT_CACHE_TIMEOUT', '300'))
+# Lifetime of responses read from a replica. A lagging replica may miss the write
+# that bumped the version, so such entries are only trusted for about the lag.
+PRODUCT_CACHE_REPLICA_TIMEOUT = int(os.getenv('PRODUCT_CACHE_REPLICA_TIMEOUT', '5'))
+
+# A write bumps the version in one process only, the others would keep serving stale responses.
+if not DEBUG and CACHES.get(PRODUCT_CACHE_ALIAS, {}).get('BACKEND') == LOCAL_MEMORY_CACHE:
+    raise ImproperlyConfigured('PRODUCT_CACHE_ALIAS needs a shared cache such as Redis, not the local-memory cache.')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -161,14 +240,31 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10,
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework.authentication.BasicAuthentication',
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.users.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'services.rendering.renderers.FastJSONRenderer',
     ],
+    'DEFAULT_PARSER_CLASSES': [
+        'services.rendering.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    # Sliding-window limits of services.throttling, counted in the default cache.
+    'DEFAULT_THROTTLE_RATES': {
+        'auth_ip': os.getenv('THROTTLE_AUTH_IP_RATE', '30/min'),
+        'auth_email': os.getenv('THROTTLE_AUTH_EMAIL_RATE', '10/min'),
+        'write': os.getenv('THROTTLE_WRITE_RATE', '120/min'),
+    },
+    # Reverse proxies in front of the app; 0 ignores X-Forwarded-For, which clients can forge.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', '0')),
 }
 
+# Counted per process, every limit would be multiplied by the number of workers.
+if not DEBUG and CACHES['default']['BACKEND'] == LOCAL_MEMORY_CACHE:
+    raise ImproperlyConfigured('Throttling needs a shared CACHE_BACKEND such as Redis, not the local-memory cache.')
+
 
 SWAGGER_SETTINGS = {
     'DEFAULT_AUTO_SCHEMA_CLASS': 'services.swagger.tags_generator.Tags',
@@ -209,17 +305,49 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=30),
 }
 
+# Rows per statement for the BaseService bulk_* operations.
+BULK_BATCH_SIZE = int(os.getenv('BULK_BATCH_SIZE', '500'))
+
+# Soft-deleted rows can be restored for this many days, then `purge_deleted` removes them.
+SOFT_DELETE_RETENTION_DAYS = int(os.getenv('SOFT_DELETE_RETENTION_DAYS', '30'))
+# Rows per DELETE of `purge_deleted`; small batches keep locks and WAL bursts short.
+SOFT_DELETE_PURGE_BATCH_SIZE = int(os.getenv('SOFT_DELETE_PURGE_BATCH_SIZE', '1000'))
+
+# Rows fetched per server-side cursor round trip by the products export.
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '2000'))
+
+# How product list pages report `count`: exact, estimate, cached or none.
+PRODUCT_COUNT_STRATEGY = os.getenv('PRODUCT_COUNT_STRATEGY', 'exact')
+# Estimates below this are replaced by an exact count, planner estimates are rough for small sets.
+PRODUCT_COUNT_EXACT_BELOW = int(os.getenv('PRODUCT_COUNT_EXACT_BELOW', '10000'))
+# Lifetime (seconds) of counts kept by the `cached` strategy.
+PRODUCT_COUNT_CACHE_TIMEOUT = int(os.getenv('PRODUCT_COUNT_CACHE_TIMEOUT', '60'))
+
+# Product image variants generated by `process_product_images`, as label:max_side pairs.
+PRODUCT_IMAGE_SIZES = {
+    label: int(size)
+    for label, size in (item.split(':') for item in os.getenv('PRODUCT_IMAGE_SIZES', 'thumb:200,medium:600').split(','))
+}
+# Worker processes resizing images, one per core by default.
+PRODUCT_IMAGE_WORKERS = int(os.getenv('PRODUCT_IMAGE_WORKERS', os.cpu_count() or 1))
+
+# Upper bounds of the product price histogram buckets; the last bucket is open-ended.
+PRODUCT_PRICE_BUCKETS = [int(bound) for bound in os.getenv('PRODUCT_PRICE_BUCKETS', '10,50,100,500,1000').split(',')]
+
+# Maximum number of ranked results returned by the products `search` parameter.
+PRODUCT_SEARCH_TOP_K = int(os.getenv('PRODUCT_SEARCH_TOP_K', '1000'))
+
+# Serve product and user reads with async views (set by Product/asgi.py).
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False') == 'True'
 
-class ProductPagination(LimitOffsetPagination):
-    default_limit = 10
-    max_limit = 100
+# Seconds a user resolved from a JWT stays cached; saves and updates drop it earlier.
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv('AUTH_USER_CACHE_TIMEOUT', '60'))
+# Product reads build the user from the token claims alone, with no lookup. A deactivated
+# user keeps read access until the token expires.
+AUTH_CLAIMS_ONLY_READS = os.getenv('AUTH_CLAIMS_ONLY_READS', 'False') == 'True'
 
-    def get_paginated_response(self, data):
-        """Override the method to customize the paginated response."""
-        return Response({
-            'count': self.count,
-            'next': self.get_next_link(),
-            'previous': self.get_previous_link(),
-            'results': data
-        })
+# A request running one query shape this many times is reported as a probable N+1.
+N_PLUS_ONE_THRESHOLD = int(os.getenv('N_PLUS_ONE_THRESHOLD', '5'))
 
+# When set, /metrics requires `Authorization: Bearer <METRICS_TOKEN>`.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
@@ -24,6 +24,8 @@ from rest_framework import routers, permissions
 
 from apps.products.urls import product_router
 from apps.users.urls import user_router
+from services.db.views import PoolStatsView
+from services.metrics.views import metrics_view
 
 router = routers.SimpleRouter()
 router.registry.extend(product_router.registry)
@@ -33,6 +35,8 @@ router.registry.extend(user_router.registry)
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include(router.urls)),
+    path('api/db/pool_stats/', PoolStatsView.as_view(), name='db-pool-stats'),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 if settings.DEBUG:
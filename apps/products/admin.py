@@ -1,9 +1,53 @@
 from django.contrib import admin
 
 from apps.products.models import Product
+from apps.products.services.products import CreateProductService, DeleteProductService, UpdateProductService
 
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    pass
+    """Writes go through the product services, as in the API.
 
+    That keeps search vectors, facet counts and the response cache in step,
+    and deletes soft. Deleted products are listed too and can be restored,
+    but not edited.
+    """
+    list_display = ('name', 'category', 'price', 'created_at', 'deleted_at')
+    list_filter = ('category', ('deleted_at', admin.EmptyFieldListFilter))
+    readonly_fields = ('deleted_at',)
+    actions = ('restore_selected',)
+
+    def get_queryset(self, request):
+        queryset = Product.all_objects.all()
+        ordering = self.get_ordering(request)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        return queryset
+
+    def has_change_permission(self, request, obj=None):
+        if obj is not None and obj.deleted_at is not None:
+            return False
+        return super().has_change_permission(request, obj)
+
+    def save_model(self, request, obj, form, change):
+        # The form has already applied the cleaned values to `obj`.
+        if not change:
+            product = CreateProductService.create(**{name: getattr(obj, name) for name in form.fields})
+            obj.pk = product.pk
+            obj._state.adding = False
+        elif form.changed_data:
+            UpdateProductService.update(obj.pk, **{name: getattr(obj, name) for name in form.changed_data})
+
+    def delete_model(self, request, obj):
+        DeleteProductService.remove(obj.pk)
+
+    def delete_queryset(self, request, queryset):
+        DeleteProductService.bulk_delete(queryset.values_list('pk', flat=True))
+
+    @admin.action(description='Restore selected deleted products')
+    def restore_selected(self, request, queryset):
+        restored = 0
+        for product_id in queryset.filter(deleted_at__isnull=False).values_list('pk', flat=True):
+            DeleteProductService.restore(product_id)
+            restored += 1
+        self.message_user(request, f'Restored {restored} products.')
@@ -1,8 +1,29 @@
-from django_filters.rest_framework import FilterSet
+from django.conf import settings
+from django.contrib.postgres.search import TrigramSimilarity
+from django_filters.constants import EMPTY_VALUES
+from django_filters.rest_framework import CharFilter, FilterSet, IsoDateTimeFilter, NumberFilter, OrderingFilter
 from .models import Product
 
 
+class ProductOrderingFilter(OrderingFilter):
+    """Ordering with an ``id`` tiebreaker, matching the ``(..., id)`` indexes."""
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        ordering = [self.get_ordering_value(param) for param in value]
+        tiebreaker = '-id' if ordering[-1].startswith('-') else 'id'
+        return qs.order_by(*ordering, tiebreaker)
+
+
 class ProductFilter(FilterSet):
+    name_fuzzy = CharFilter(method='filter_name_fuzzy', label='Typo-tolerant name match')
+    price_min = NumberFilter(field_name='price', lookup_expr='gte')
+    price_max = NumberFilter(field_name='price', lookup_expr='lte')
+    created_after = IsoDateTimeFilter(field_name='created_at', lookup_expr='gte')
+    # Only orderings backed by a (category, field, id) / (field, id) index.
+    ordering = ProductOrderingFilter(fields=('price', 'created_at'))
+
     class Meta:
         model = Product
         fields = {
@@ -10,3 +31,12 @@ class ProductFilter(FilterSet):
             'name': ['icontains'],
             'description': ['icontains'],
         }
+
+    def filter_name_fuzzy(self, queryset, name, value):
+        # `trigram_similar` (the `%` operator) narrows rows through the trigram
+        # index, the similarity annotation then applies the configured threshold.
+        return queryset.filter(name__trigram_similar=value).annotate(
+            name_similarity=TrigramSimilarity('name', value)
+        ).filter(
+            name_similarity__gte=settings.PRODUCT_FUZZY_THRESHOLD
+        ).order_by('-name_similarity', 'id')
@@ -0,0 +1,268 @@
+import csv
+import io
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+
+from apps.products.models import PRODUCT_SEARCH_VECTOR_SQL, Category, Product
+from apps.products.services.cache import product_cache
+from apps.products.services.facets import ProductFacetService
+
+# Median price and spread of the log-normal price distribution per category.
+PRICE_DISTRIBUTIONS = {
+    Category.ELECTRONICS: (5.0, 1.0),
+    Category.FASHION: (3.6, 0.8),
+    Category.BOOKS: (2.8, 0.5),
+    Category.FOOD: (2.0, 0.7),
+    Category.TOYS: (3.2, 0.8),
+}
+MAX_PRICE = Decimal('99999999.99')
+
+NOUNS = {
+    Category.ELECTRONICS: ('phone', 'laptop', 'headphones', 'charger', 'speaker', 'camera', 'monitor', 'keyboard'),
+    Category.FASHION: ('shirt', 'dress', 'jacket', 'sneakers', 'scarf', 'jeans', 'hat', 'socks'),
+    Category.BOOKS: ('book', 'novel', 'cookbook', 'atlas', 'guide', 'anthology', 'biography', 'textbook'),
+    Category.FOOD: ('coffee', 'tea', 'chocolate', 'honey', 'pasta', 'olive oil', 'granola', 'spices'),
+    Category.TOYS: ('toy', 'puzzle', 'robot', 'doll', 'blocks', 'kite', 'board game', 'plush bear'),
+}
+ADJECTIVES = (
+    'classic', 'wireless', 'organic', 'cotton', 'portable', 'premium', 'compact', 'vintage',
+    'smart', 'handmade', 'eco', 'deluxe', 'mini', 'family', 'travel', 'limited',
+)
+BRANDS = ('Acme', 'Nordic', 'Zenith', 'Orion', 'Atlas', 'Lumen', 'Vega', 'Kite', 'Pioneer', 'Bolt')
+FILLER = (
+    'with', 'for', 'and', 'the', 'a', 'set', 'of', 'everyday', 'use', 'gift', 'quality', 'durable',
+    'light', 'soft', 'fast', 'new', 'edition', 'pack', 'home', 'kids', 'office', 'outdoor', 'design',
+)
+FIRST_NAMES = ('Alex', 'Maria', 'Ivan', 'Olga', 'John', 'Anna', 'Timur', 'Aigerim', 'Sergey', 'Elena')
+LAST_NAMES = ('Smith', 'Ivanov', 'Petrova', 'Kim', 'Garcia', 'Nurlanov', 'Brown', 'Sokolova', 'Lee', 'Novak')
+
+PRODUCT_COLUMNS = ('name', 'description', 'price', 'category', 'created_at')
+USER_COLUMNS = (
+    'password', 'is_superuser', 'username', 'first_name', 'last_name', 'email',
+    'is_staff', 'is_active', 'date_joined', 'created_at', 'updated_at',
+)
+
+
+def chunk_random(seed: int, kind: str, index: int) -> random.Random:
+    """Each chunk has its own generator, so the output does not depend on the worker count."""
+    return random.Random(f'{seed}:{kind}:{index}')
+
+
+def category_weights(seed: int, skew: float) -> tuple[list, list]:
+    """Zipf-like weights over the categories, which category is the most popular depends on the seed."""
+    categories = list(Category.values)
+    random.Random(f'{seed}:categories').shuffle(categories)
+    return categories, [1 / rank ** skew for rank in range(1, len(categories) + 1)]
+
+
+def created_at(rng: random.Random, context: dict) -> datetime:
+    # Squaring skews the ages towards recent rows, like a growing catalog.
+    return context['until'] - timedelta(days=context['days'] * rng.random() ** 2)
+
+
+def product_rows(rng: random.Random, start: int, count: int, context: dict):
+    categories, weights = category_weights(context['seed'], context['category_skew'])
+    for number in range(start, start + count):
+        category = rng.choices(categories, weights)[0]
+        noun = rng.choice(NOUNS[category])
+        name = f'{rng.choice(BRANDS)} {rng.choice(ADJECTIVES)} {noun} {number}'
+
+        mu, sigma = PRICE_DISTRIBUTIONS[category]
+        price = min(Decimal(rng.lognormvariate(mu, sigma)).quantize(Decimal('0.01')), MAX_PRICE)
+        price = max(price, Decimal('0.01'))
+
+        # Log-normal word counts: mostly short descriptions and a long tail.
+        description = None
+        if rng.random() >= context['empty_descriptions']:
+            words = min(int(rng.lognormvariate(3.0, 0.9)) + 1, 500)
+            vocabulary = NOUNS[category] + ADJECTIVES + FILLER
+            description = ' '.join(rng.choices(vocabulary, k=words)).capitalize() + '.'
+
+        yield {
+            'name': name,
+            'description': description,
+            'price': price,
+            'category': category,
+            'created_at': created_at(rng, context),
+        }
+
+
+def user_rows(rng: random.Random, start: int, count: int, context: dict):
+    for number in range(start, start + count):
+        joined = created_at(rng, context)
+        email = f'user{number}@{context["email_domain"]}'
+        yield {
+            'password': context['password_hash'],
+            'is_superuser': False,
+            # Usernames are unique too, the domain keeps them apart between runs like the emails.
+            'username': email,
+            'first_name': rng.choice(FIRST_NAMES),
+            'last_name': rng.choice(LAST_NAMES),
+            'email': email,
+            'is_staff': False,
+            'is_active': True,
+            'date_joined': joined,
+            'created_at': joined,
+            'updated_at': joined,
+        }
+
+
+def copy_rows(cursor, table: str, columns: tuple, rows) -> None:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row[column] for column in columns])
+    buffer.seek(0)
+    copy_sql = f'COPY {table} ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)'
+    if hasattr(cursor.cursor, 'copy_expert'):
+        cursor.cursor.copy_expert(copy_sql, buffer)
+    else:
+        with cursor.cursor.copy(copy_sql) as copy:
+            copy.write(buffer.getvalue())
+
+
+def write_products(rows) -> None:
+    if connection.vendor != 'postgresql':
+        # auto_now_add replaces created_at here, only COPY keeps the generated dates.
+        Product.objects.bulk_create([Product(**row) for row in rows], batch_size=settings.BULK_BATCH_SIZE)
+        return
+    table = connection.ops.quote_name(Product._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TEMP TABLE product_generate ('
+            ' name varchar(255), description text, price numeric(10, 2),'
+            ' category varchar(50), created_at timestamptz'
+            ') ON COMMIT DROP'
+        )
+        copy_rows(cursor, 'product_generate', PRODUCT_COLUMNS, rows)
+        # The staging table lets the search vector be computed in the same single write.
+        cursor.execute(
+            f'INSERT INTO {table} (created_at, updated_at, name, description, price, category, '
+            f'image_variants, search_vector) '
+            f'SELECT s.created_at, s.created_at, s.name, s.description, s.price, s.category, '
+            f"'{{}}'::jsonb, {PRODUCT_SEARCH_VECTOR_SQL.format(alias='s')} "
+            f'FROM product_generate s'
+        )
+
+
+def write_users(rows) -> None:
+    User = get_user_model()
+    if connection.vendor != 'postgresql':
+        User.objects.bulk_create([User(**row) for row in rows], batch_size=settings.BULK_BATCH_SIZE)
+        return
+    with connection.cursor() as cursor:
+        copy_rows(cursor, connection.ops.quote_name(User._meta.db_table), USER_COLUMNS, rows)
+
+
+GENERATORS = {
+    'products': (product_rows, write_products),
+    'users': (user_rows, write_users),
+}
+
+
+def generate_chunk(kind: str, index: int, start: int, count: int, context: dict) -> int:
+    """Generates and inserts one chunk in a single transaction; runs in the worker processes."""
+    build, write = GENERATORS[kind]
+    rows = build(chunk_random(context['seed'], kind, index), start, count, context)
+    with transaction.atomic():
+        write(rows)
+    return count
+
+
+class Command(BaseCommand):
+    help = (
+        'Fills the database with a deterministic synthetic catalog and user base for scale testing. '
+        'Chunks are generated in parallel worker processes and loaded with COPY on PostgreSQL.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=0, help='Number of products to generate.')
+        parser.add_argument('--users', type=int, default=0, help='Number of users to generate.')
+        parser.add_argument('--seed', type=int, default=0, help='The same seed produces the same rows.')
+        parser.add_argument('--chunk-size', type=int, default=50000, help='Rows per chunk and transaction.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--days', type=int, default=730, help='Spread created_at over this many days.')
+        parser.add_argument(
+            '--until', default=None,
+            help='Latest created_at as YYYY-MM-DD, defaults to today. Fix it to reproduce a dataset exactly.',
+        )
+        parser.add_argument('--category-skew', type=float, default=1.2, help='Zipf exponent of category sizes.')
+        parser.add_argument(
+            '--empty-descriptions', type=float, default=0.05, help='Share of products without a description.',
+        )
+        parser.add_argument(
+            '--user-password', default='password',
+            help='Password of every generated user, so load tests can sign in as user<N>@<domain>.',
+        )
+        parser.add_argument(
+            '--email-domain', default=None,
+            help='Domain of the generated emails, defaults to seed<SEED>.example.com so seeds do not collide.',
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] <= 0 or options['workers'] <= 0:
+            raise CommandError('--chunk-size and --workers must be positive.')
+        try:
+            until = datetime.strptime(options['until'], '%Y-%m-%d') if options['until'] else datetime.now()
+        except ValueError:
+            raise CommandError('--until must be a date in the YYYY-MM-DD format.')
+
+        context = {
+            'seed': options['seed'],
+            'until': until.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=timezone.utc),
+            'days': options['days'],
+            'category_skew': options['category_skew'],
+            'empty_descriptions': options['empty_descriptions'],
+            # One hash for all users: hashing a million passwords would dominate the run.
+            'password_hash': make_password(options['user_password']),
+            'email_domain': options['email_domain'] or f'seed{options["seed"]}.example.com',
+        }
+
+        for kind in ('users', 'products'):
+            if options[kind] > 0:
+                self.generate(kind, options[kind], options['chunk_size'], options['workers'], context)
+
+        if options['products'] > 0:
+            # The rows bypass the product services, so the facets are recounted once.
+            ProductFacetService.rebuild()
+            product_cache.bump()
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+    def generate(self, kind: str, total: int, chunk_size: int, workers: int, context: dict):
+        chunks = [
+            (kind, index, start, min(chunk_size, total - start), context)
+            for index, start in enumerate(range(0, total, chunk_size))
+        ]
+        done = 0
+        started = time.monotonic()
+        if workers == 1:
+            for chunk in chunks:
+                done += generate_chunk(*chunk)
+                self.report(kind, done, total, started)
+        else:
+            # Forked workers must not share the parent's database connection.
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as executor:
+                for future in as_completed([executor.submit(generate_chunk, *chunk) for chunk in chunks]):
+                    done += future.result()
+                    self.report(kind, done, total, started)
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {done} {kind} in {time.monotonic() - started:.1f}s.'
+        ))
+
+    def report(self, kind: str, done: int, total: int, started: float):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(f'{kind}: {done}/{total}, {done / elapsed:.0f} rows/sec')
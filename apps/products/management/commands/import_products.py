@@ -0,0 +1,204 @@
+import csv
+import io
+import json
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from rest_framework import serializers
+
+from apps.products.models import PRODUCT_SEARCH_VECTOR_SQL, Product
+from apps.products.serializers import ProductSerializer
+from apps.products.services.cache import product_cache
+from apps.products.services.facets import ProductFacetService
+from apps.products.services.images import ProductImageService
+from apps.products.services.products import CreateProductService
+
+COLUMNS = ('id', 'name', 'description', 'price', 'category', 'image')
+UPDATE_COLUMNS = ('name', 'description', 'price', 'category', 'image')
+
+
+class Command(BaseCommand):
+    help = (
+        'Imports products from a CSV or NDJSON file. Rows with an id update the existing product, '
+        'and restore it if it was deleted. '
+        'Uses COPY into a staging table on PostgreSQL and batched bulk_create elsewhere.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or NDJSON file, in the format of the products export.')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help='Defaults to the file extension.')
+        parser.add_argument('--batch-size', type=int, default=50000, help='Rows per COPY / bulk_create batch.')
+        parser.add_argument('--rejects', help='Write rejected rows with their errors to this NDJSON file.')
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or ('csv' if options['path'].endswith('.csv') else 'ndjson')
+        batch_size = options['batch_size']
+        writer = self.copy_batch if connection.vendor == 'postgresql' else self.bulk_create_batch
+
+        imported = rejected = 0
+        started = time.monotonic()
+        rejects = open(options['rejects'], 'w', encoding='utf-8') if options['rejects'] else None
+        try:
+            with open(options['path'], encoding='utf-8', newline='') as source:
+                rows = self.validated_rows(self.read_rows(source, file_format), rejects)
+                while True:
+                    batch = list(islice(rows, batch_size))
+                    if not batch:
+                        break
+                    valid = [row for row in batch if row is not None]
+                    rejected += len(batch) - len(valid)
+                    if valid:
+                        with transaction.atomic():
+                            writer(valid)
+                        imported += len(valid)
+                    self.report(imported, rejected, started)
+        finally:
+            if rejects:
+                rejects.close()
+
+        if connection.vendor == 'postgresql':
+            self.reset_id_sequence()
+        # COPY bypasses the product services, so the facets are recounted once.
+        ProductFacetService.rebuild()
+        product_cache.bump()
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported} products, rejected {rejected} rows in {time.monotonic() - started:.1f}s.'
+        ))
+
+    def report(self, imported: int, rejected: int, started: float):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(f'{imported} imported, {rejected} rejected, {imported / elapsed:.0f} rows/sec')
+
+    @staticmethod
+    def read_rows(source, file_format: str):
+        """Yields ``(row, parse_error)`` pairs without loading the file into memory."""
+        if file_format == 'csv':
+            for row in csv.DictReader(source):
+                yield row, None
+            return
+        for line in source:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line), None
+            except ValueError as e:
+                yield {'raw': line}, str(e)
+
+    @staticmethod
+    def validated_rows(rows, rejects):
+        """Validates rows with ProductSerializer; yields a clean dict or ``None`` for a rejected row."""
+        # One serializer instance is reused, run_validation() applies the same
+        # field checks, validate_price() and validate() as the API does.
+        serializer = ProductSerializer()
+        media_url = settings.MEDIA_URL
+        for number, (row, error) in enumerate(rows, start=1):
+            errors = error
+            if errors is None:
+                try:
+                    data = {key: row.get(key) for key in ('name', 'description', 'price', 'category')}
+                    data = dict(serializer.run_validation(data))
+                    data['id'] = int(row['id']) if row.get('id') not in (None, '') else None
+                    image = row.get('image') or None
+                    if image and image.startswith(media_url):
+                        image = image[len(media_url):]
+                    data['image'] = image
+                    yield data
+                    continue
+                except serializers.ValidationError as e:
+                    errors = e.detail
+                except (TypeError, ValueError, AttributeError) as e:
+                    errors = str(e)
+            if rejects:
+                rejects.write(json.dumps({'record': number, 'row': row, 'errors': errors}, ensure_ascii=False) + '\n')
+            yield None
+
+    @staticmethod
+    def deduplicate(rows):
+        # ON CONFLICT cannot touch the same id twice in one statement, the last row wins.
+        by_id = {}
+        new = []
+        for row in rows:
+            if row['id'] is None:
+                new.append(row)
+            else:
+                by_id[row['id']] = row
+        return new + list(by_id.values())
+
+    def copy_batch(self, rows):
+        table = connection.ops.quote_name(Product._meta.db_table)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in self.deduplicate(rows):
+            writer.writerow([row[column] for column in COLUMNS])
+        buffer.seek(0)
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMP TABLE product_import ('
+                ' id bigint, name varchar(255), description text, price numeric(10, 2),'
+                ' category varchar(50), image varchar(100)'
+                ') ON COMMIT DROP'
+            )
+            copy_sql = f'COPY product_import ({", ".join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)'
+            if hasattr(cursor.cursor, 'copy_expert'):
+                cursor.cursor.copy_expert(copy_sql, buffer)
+            else:
+                with cursor.cursor.copy(copy_sql) as copy:
+                    copy.write(buffer.getvalue())
+
+            # Variants of images the feed replaces are deleted once the batch commits.
+            cursor.execute(
+                f'SELECT p.image_variants FROM {table} p JOIN product_import s ON s.id = p.id '
+                f'WHERE p.image IS DISTINCT FROM s.image FOR UPDATE OF p'
+            )
+            # Django leaves jsonb undecoded on raw cursors.
+            ProductImageService.discard_variants(json.loads(variants) for (variants,) in cursor.fetchall())
+
+            updates = ', '.join(f'{column} = EXCLUDED.{column}' for column in UPDATE_COLUMNS)
+            cursor.execute(
+                f'INSERT INTO {table} (id, created_at, updated_at, {", ".join(UPDATE_COLUMNS)}, '
+                f'image_variants, search_vector) '
+                f'SELECT COALESCE(s.id, nextval(pg_get_serial_sequence(%s, %s))), now(), now(), '
+                f'{", ".join("s." + column for column in UPDATE_COLUMNS)}, '
+                f"'{{}}'::jsonb, {PRODUCT_SEARCH_VECTOR_SQL.format(alias='s')} "
+                f'FROM product_import s '
+                f'ON CONFLICT (id) DO UPDATE SET updated_at = EXCLUDED.updated_at, {updates}, '
+                # A row in the feed brings a soft-deleted product back.
+                f'deleted_at = NULL, '
+                f'search_vector = EXCLUDED.search_vector, '
+                # A changed image is queued again for `process_product_images`.
+                f'image_variants = CASE WHEN {table}.image IS DISTINCT FROM EXCLUDED.image '
+                f'THEN EXCLUDED.image_variants ELSE {table}.image_variants END',
+                [Product._meta.db_table, 'id'],
+            )
+
+    def bulk_create_batch(self, rows):
+        rows = self.deduplicate(rows)
+        new = [{k: v for k, v in row.items() if k != 'id'} for row in rows if row['id'] is None]
+        existing = [Product(**row) for row in rows if row['id'] is not None]
+        if new:
+            CreateProductService.bulk_create(new)
+        if existing:
+            Product.objects.bulk_create(
+                existing,
+                batch_size=settings.BULK_BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=['id'],
+                # deleted_at is None on the new instances, so tombstones are revived here too.
+                update_fields=[*UPDATE_COLUMNS, 'updated_at', 'deleted_at'],
+            )
+
+    @staticmethod
+    def reset_id_sequence():
+        # Explicit ids from the feed do not advance the sequence.
+        table = Product._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT setval(pg_get_serial_sequence(%s, %s), COALESCE(MAX(id), 1)) '
+                f'FROM {connection.ops.quote_name(table)}',
+                [table, 'id'],
+            )
@@ -0,0 +1,29 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.products.services.images import ProductImageService
+
+
+class Command(BaseCommand):
+    help = 'Generates thumbnail and WebP variants of product images in a pool of worker processes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.PRODUCT_IMAGE_WORKERS)
+        parser.add_argument('--batch-size', type=int, default=100, help='Products taken from the queue at once.')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds to sleep when the queue is empty.')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty.')
+
+    def handle(self, *args, **options):
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=django.setup) as executor:
+            while True:
+                processed = ProductImageService.process_pending(executor, options['batch_size'])
+                if processed:
+                    self.stdout.write(f'Processed {processed} product images')
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
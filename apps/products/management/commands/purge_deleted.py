@@ -0,0 +1,50 @@
+import time
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from services.base.models import SoftDeleteModel
+
+
+class Command(BaseCommand):
+    help = (
+        'Permanently deletes soft-deleted rows older than SOFT_DELETE_RETENTION_DAYS. '
+        'Rows go in small batches, each in its own short transaction.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.SOFT_DELETE_RETENTION_DAYS)
+        parser.add_argument('--batch-size', type=int, default=settings.SOFT_DELETE_PURGE_BATCH_SIZE)
+        parser.add_argument('--pause', type=float, default=0.1, help='Seconds to sleep between batches.')
+        parser.add_argument('--interval', type=float, default=3600, help='Seconds to sleep between runs.')
+        parser.add_argument('--once', action='store_true', help='Exit after one run.')
+
+    def handle(self, *args, **options):
+        models = [model for model in apps.get_models() if issubclass(model, SoftDeleteModel)]
+        while True:
+            cutoff = timezone.now() - timedelta(days=options['days'])
+            for model in models:
+                purged = self.purge(model, cutoff, options['batch_size'], options['pause'])
+                if purged:
+                    self.stdout.write(f'Purged {purged} {model._meta.verbose_name_plural}')
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+
+    @staticmethod
+    def purge(model, cutoff, batch_size: int, pause: float) -> int:
+        # Served by the partial index on deleted_at, which holds only tombstones.
+        expired = model.all_objects.filter(deleted_at__lt=cutoff)
+        purged = 0
+        while True:
+            ids = list(expired.order_by('deleted_at').values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return purged
+            with transaction.atomic():
+                # Re-checked, a row restored in the meantime is kept.
+                purged += expired.filter(pk__in=ids).delete()[0]
+            time.sleep(pause)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.products.services.facets import ProductFacetService
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the product facet counts, e.g. after changing PRODUCT_PRICE_BUCKETS.'
+
+    def handle(self, *args, **options):
+        ProductFacetService.rebuild()
+        self.stdout.write(self.style.SUCCESS('Product facets rebuilt.'))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from apps.products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Backfills the stored full-text search vector of products in id-ordered batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows updated per statement.')
+        parser.add_argument('--all', action='store_true', help='Recompute rows that already have a vector.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        queryset = Product.objects.all()
+        if not options['all']:
+            queryset = queryset.filter(search_vector__isnull=True)
+
+        last_id = 0
+        total = 0
+        while True:
+            ids = list(
+                queryset.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            # Each batch is its own short statement, so locks are held briefly.
+            total += Product.objects.filter(id__in=ids).update_search_vector()
+            last_id = ids[-1]
+            self.stdout.write(f'Updated {total} products (last id {last_id})')
+
+        self.stdout.write(self.style.SUCCESS(f'Search vectors updated for {total} products.'))
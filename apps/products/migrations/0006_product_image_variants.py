@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:49
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Built concurrently, see 0002.
+    atomic = False
+
+    dependencies = [
+        ('products', '0005_product_category_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Варианты изображения'),
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(condition=models.Q(('image__gt', ''), ('image_variants', {})), fields=['id'], name='product_image_pending_idx'),
+        ),
+    ]
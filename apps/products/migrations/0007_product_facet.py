@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_product_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('electronics', 'Electronics'), ('fashion', 'Fashion'), ('books', 'Books'), ('food', 'Food'), ('toys', 'Toys')], max_length=50, verbose_name='Категория продукта')),
+                ('bucket', models.PositiveSmallIntegerField(verbose_name='Ценовой диапазон')),
+                ('count', models.BigIntegerField(default=0, verbose_name='Количество продуктов')),
+            ],
+            options={
+                'verbose_name': 'Фасет продуктов',
+                'verbose_name_plural': 'Фасеты продуктов',
+                'constraints': [models.UniqueConstraint(fields=('category', 'bucket'), name='product_facet_category_bucket_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,147 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:17
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # The indexes are rebuilt without blocking writes to the table, and
+    # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction. Each
+    # partial index is built under a temporary name next to the old one, which
+    # keeps serving queries until it is dropped and the new one renamed.
+    atomic = False
+
+    dependencies = [
+        ('products', '0007_product_facet'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['created_at', 'id'], name='product_created_id_new'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='product',
+            name='product_created_id_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='product',
+            new_name='product_created_id_idx',
+            old_name='product_created_id_new',
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['price', 'id'], name='product_price_id_new'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='product',
+            name='product_price_id_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='product',
+            new_name='product_price_id_idx',
+            old_name='product_price_id_new',
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['category', 'price', 'id'], name='product_cat_price_id_new'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='product',
+            name='product_cat_price_id_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='product',
+            new_name='product_cat_price_id_idx',
+            old_name='product_cat_price_id_new',
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['category', 'created_at', 'id'], name='product_cat_created_id_new'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='product',
+            name='product_cat_created_id_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='product',
+            new_name='product_cat_created_id_idx',
+            old_name='product_cat_created_id_new',
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(condition=models.Q(('deleted_at__isnull', True)), fields=['search_vector'], name='product_search_vector_new'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='product',
+            name='product_search_vector_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='product',
+            new_name='product_search_vector_idx',
+            old_name='product_search_vector_new',
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='gin_trgm_ops'), condition=models.Q(('deleted_at__isnull', True)), name='product_name_upper_trgm_new'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='product',
+            name='product_name_upper_trgm_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='product',
+            new_name='product_name_upper_trgm_idx',
+            old_name='product_name_upper_trgm_new',
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('description'), name='gin_trgm_ops'), condition=models.Q(('deleted_at__isnull', True)), name='product_desc_upper_trgm_new'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='product',
+            name='product_desc_upper_trgm_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='product',
+            new_name='product_desc_upper_trgm_idx',
+            old_name='product_desc_upper_trgm_new',
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(condition=models.Q(('deleted_at__isnull', True)), fields=['name'], name='product_name_trgm_new', opclasses=['gin_trgm_ops']),
+        ),
+        RemoveIndexConcurrently(
+            model_name='product',
+            name='product_name_trgm_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='product',
+            new_name='product_name_trgm_idx',
+            old_name='product_name_trgm_new',
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(condition=models.Q(('image__gt', ''), ('image_variants', {}), ('deleted_at__isnull', True)), fields=['id'], name='product_image_pending_new'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='product',
+            name='product_image_pending_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='product',
+            new_name='product_image_pending_idx',
+            old_name='product_image_pending_new',
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True), _negated=True), fields=['deleted_at'], name='product_deleted_at_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count
+
+
+def rebuild_facets(apps, schema_editor):
+    """Counts the existing products, ProductFacetService only keeps the counts up to date from here on."""
+    from apps.products.services.facets import ProductFacetService
+
+    Product = apps.get_model('products', 'Product')
+    ProductFacet = apps.get_model('products', 'ProductFacet')
+    db_alias = schema_editor.connection.alias
+
+    rows = (
+        Product.objects.using(db_alias)
+        .filter(deleted_at__isnull=True)
+        .order_by()
+        .annotate(bucket=ProductFacetService.bucket_expression())
+        .values('category', 'bucket')
+        .annotate(count=Count('id'))
+    )
+    counts = {(row['category'], row['bucket']): row['count'] for row in rows}
+    categories = [choice[0] for choice in Product._meta.get_field('category').choices]
+    ProductFacet.objects.using(db_alias).all().delete()
+    ProductFacet.objects.using(db_alias).bulk_create([
+        ProductFacet(category=category, bucket=bucket, count=counts.get((category, bucket), 0))
+        for category in categories
+        for bucket in range(len(settings.PRODUCT_PRICE_BUCKETS) + 1)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_product_soft_delete'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_facets, migrations.RunPython.noop),
+    ]
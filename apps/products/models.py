@@ -1,6 +1,10 @@
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db import connections, models
+from django.db.models import Value
+from django.db.models.functions import Upper
 
-from services.base.models import TimeStampModel
+from services.base.models import ALIVE, SoftDeleteManager, SoftDeleteModel, SoftDeleteQuerySet
 
 
 class Category(models.TextChoices):
@@ -11,7 +15,39 @@ class Category(models.TextChoices):
     TOYS = 'toys', 'Toys'
 
 
-class Product(TimeStampModel):
+# Weighted so that matches in the name rank above matches in the description.
+PRODUCT_SEARCH_VECTOR = SearchVector('name', weight='A') + SearchVector('description', weight='B')
+
+
+def product_search_vector(**changes):
+    """PRODUCT_SEARCH_VECTOR with the changed name and description as values.
+
+    The SET expressions of an UPDATE read the old row, so the new values have
+    to be passed in to compute the vector in the same statement.
+    """
+    return (
+        SearchVector(Value(changes['name']) if 'name' in changes else 'name', weight='A')
+        + SearchVector(Value(changes['description']) if 'description' in changes else 'description', weight='B')
+    )
+
+
+# Raw SQL form of PRODUCT_SEARCH_VECTOR over the columns of ``{alias}``, for the COPY based loaders.
+PRODUCT_SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector(COALESCE({alias}.name, '')), 'A') || "
+    "setweight(to_tsvector(COALESCE({alias}.description, '')), 'B')"
+)
+
+
+class ProductQuerySet(SoftDeleteQuerySet):
+
+    def update_search_vector(self) -> int:
+        """Recomputes the stored search vector for every row in the queryset."""
+        if connections[self.db].vendor != 'postgresql':
+            return 0
+        return self.update(search_vector=PRODUCT_SEARCH_VECTOR)
+
+
+class Product(SoftDeleteModel):
     name = models.CharField(
         max_length=255,
         verbose_name="Название продукта"
@@ -37,10 +73,79 @@ class Product(TimeStampModel):
         null=True,
         verbose_name="Изображение продукта"
     )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name="Варианты изображения"
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name="Поисковый вектор"
+    )
+
+    objects = SoftDeleteManager.from_queryset(ProductQuerySet)()
+    all_objects = ProductQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Продукт"
         verbose_name_plural = "Продукты"
+        # Partial indexes: queries through `objects` only ever read live rows,
+        # so soft-deleted rows are left out of them.
+        indexes = [
+            # Keyset pagination: (created_at, id) and (price, id) range scans.
+            models.Index(fields=['created_at', 'id'], name='product_created_id_idx', condition=ALIVE),
+            models.Index(fields=['price', 'id'], name='product_price_id_idx', condition=ALIVE),
+            # Price range / ordering inside a category is a single range scan.
+            models.Index(fields=['category', 'price', 'id'], name='product_cat_price_id_idx', condition=ALIVE),
+            models.Index(fields=['category', 'created_at', 'id'], name='product_cat_created_id_idx', condition=ALIVE),
+            GinIndex(fields=['search_vector'], name='product_search_vector_idx', condition=ALIVE),
+            # `icontains` compiles to UPPER(col) LIKE UPPER('%x%'), so the trigram
+            # indexes are built on the same expression.
+            GinIndex(
+                OpClass(Upper('name'), name='gin_trgm_ops'), name='product_name_upper_trgm_idx', condition=ALIVE
+            ),
+            GinIndex(
+                OpClass(Upper('description'), name='gin_trgm_ops'), name='product_desc_upper_trgm_idx', condition=ALIVE
+            ),
+            # Similarity (`%`) operator used by the `name_fuzzy` filter.
+            GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='product_name_trgm_idx', condition=ALIVE),
+            # Products whose image still waits for `process_product_images`.
+            models.Index(
+                fields=['id'],
+                name='product_image_pending_idx',
+                condition=models.Q(image_variants={}, image__gt='') & ALIVE,
+            ),
+            # Tombstones, for `purge_deleted`.
+            models.Index(fields=['deleted_at'], name='product_deleted_at_idx', condition=~ALIVE),
+        ]
 
     def __str__(self):
         return self.name
+
+
+class ProductFacet(models.Model):
+    """Number of products per category and price bucket, kept up to date by the product services."""
+    category = models.CharField(
+        max_length=50,
+        choices=Category.choices,
+        verbose_name="Категория продукта"
+    )
+    bucket = models.PositiveSmallIntegerField(
+        verbose_name="Ценовой диапазон"
+    )
+    count = models.BigIntegerField(
+        default=0,
+        verbose_name="Количество продуктов"
+    )
+
+    class Meta:
+        verbose_name = "Фасет продуктов"
+        verbose_name_plural = "Фасеты продуктов"
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'bucket'], name='product_facet_category_bucket_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.category} #{self.bucket}: {self.count}'
@@ -0,0 +1,361 @@
+import base64
+import binascii
+import hashlib
+import json
+from decimal import Decimal, InvalidOperation
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class CountStrategy:
+    """How ProductPagination counts the filtered set; ``exact`` counts also drive ``next``."""
+    exact = True
+
+    def count(self, queryset):
+        raise NotImplementedError
+
+    async def acount(self, queryset):
+        """Async counterpart of ``count`` for the ASGI views."""
+        return await sync_to_async(self.count)(queryset)
+
+
+class ExactCount(CountStrategy):
+    """``SELECT COUNT(*)`` over the filtered set."""
+    exact = True
+
+    def count(self, queryset):
+        return queryset.count()
+
+    async def acount(self, queryset):
+        return await queryset.acount()
+
+
+class EstimatedCount(CountStrategy):
+    """Planner row estimate: live share of ``reltuples`` when unfiltered, ``EXPLAIN`` otherwise.
+
+    Small estimates are replaced by an exact count, which is cheap there and
+    where the planner is least accurate. Other backends always count exactly.
+    """
+    exact = False
+
+    def count(self, queryset):
+        if connections[queryset.db].vendor != 'postgresql':
+            return queryset.count()
+        queryset = queryset.order_by()
+        if self.is_unfiltered(queryset):
+            estimate = self.table_estimate(queryset)
+        else:
+            estimate = json.loads(queryset.explain(format='json'))[0]['Plan']['Plan Rows']
+        if estimate < settings.PRODUCT_COUNT_EXACT_BELOW:
+            return queryset.count()
+        return int(estimate)
+
+    @staticmethod
+    def is_unfiltered(queryset) -> bool:
+        """True when the queryset has no filter beyond the default manager's, e.g. the soft-delete one."""
+        return queryset.query.where == queryset.model._default_manager.all().query.where
+
+    @staticmethod
+    def table_estimate(queryset) -> int:
+        """``reltuples`` scaled by the share of rows with no ``deleted_at``, from the column statistics."""
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT reltuples, (
+                    SELECT null_frac FROM pg_stats
+                    WHERE schemaname = current_schema() AND tablename = %s AND attname = 'deleted_at'
+                )
+                FROM pg_class WHERE oid = %s::regclass
+                """,
+                [queryset.model._meta.db_table, queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        # reltuples is -1 and there are no statistics until the table has been vacuumed or analyzed.
+        if not row or row[0] < 0:
+            return 0
+        reltuples, live_share = row
+        return int(reltuples * (live_share if live_share is not None else 1))
+
+
+class CachedCount(CountStrategy):
+    """Exact count kept in the cache per filter signature for a short TTL."""
+    exact = False
+
+    def count(self, queryset):
+        sql, params = queryset.order_by().query.sql_with_params()
+        key = 'products:count:' + hashlib.sha1(repr((sql, params)).encode()).hexdigest()
+        return caches[settings.PRODUCT_CACHE_ALIAS].get_or_set(
+            key, queryset.count, timeout=settings.PRODUCT_COUNT_CACHE_TIMEOUT
+        )
+
+
+class NoCount(CountStrategy):
+    """Skips the count, pages only report ``has_next``."""
+    exact = False
+
+    def count(self, queryset):
+        return None
+
+    async def acount(self, queryset):
+        return None
+
+
+COUNT_STRATEGIES = {
+    'exact': ExactCount,
+    'estimate': EstimatedCount,
+    'cached': CachedCount,
+    'none': NoCount,
+}
+
+
+class ProductPagination(LimitOffsetPagination):
+    default_limit = 10
+    max_limit = 100
+
+    def __init__(self):
+        self.count_strategy = COUNT_STRATEGIES[settings.PRODUCT_COUNT_STRATEGY]()
+        # Set by the view when it already counted the filtered set.
+        self.known_count = None
+
+    def get_count(self, queryset):
+        if self.known_count is not None:
+            return self.known_count
+        return self.count_strategy.count(queryset)
+
+    async def aget_count(self, queryset):
+        if self.known_count is not None:
+            return self.known_count
+        return await self.count_strategy.acount(queryset)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.count_strategy.exact:
+            return super().paginate_queryset(queryset, request, view)
+        if not self.start_page(request):
+            return None
+        self.count = self.get_count(queryset)
+        return self.end_page(list(queryset[self.get_page_slice()]))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Async counterpart of ``paginate_queryset`` for the ASGI views."""
+        if not self.start_page(request):
+            return None
+        self.count = await self.aget_count(queryset)
+        if self.count_strategy.exact and (self.count == 0 or self.offset > self.count):
+            return []
+        return self.end_page([row async for row in queryset[self.get_page_slice()].aiterator()])
+
+    def start_page(self, request) -> bool:
+        """Reads limit and offset, returns False when pagination is disabled."""
+        self.request = request
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return False
+        self.offset = self.get_offset(request)
+        return True
+
+    def get_page_slice(self) -> slice:
+        # Inexact counts cannot tell whether there is a next page, so one
+        # extra row is fetched instead.
+        extra = 0 if self.count_strategy.exact else 1
+        return slice(self.offset, self.offset + self.limit + extra)
+
+    def end_page(self, rows: list) -> list:
+        if self.count_strategy.exact:
+            return rows
+        self.has_next = len(rows) > self.limit
+        return rows[:self.limit]
+
+    def get_next_link(self):
+        if self.count_strategy.exact:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(url, self.offset_query_param, self.offset + self.limit)
+
+    def get_paginated_response(self, data):
+        """Override the method to customize the paginated response."""
+        response = {
+            'count': self.count,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data
+        }
+        if not self.count_strategy.exact:
+            response['has_next'] = self.has_next
+        return Response(response)
+
+
+class ProductKeysetPagination(BasePagination):
+    """Keyset (cursor) pagination over an indexed ``(field, id)`` tuple.
+
+    Every page is a single index range scan that starts right after the last
+    row of the previous page, so there is no ``OFFSET`` and no ``COUNT(*)``.
+    Cursors are opaque tokens: clients only follow ``next``/``previous``.
+    """
+    cursor_query_param = 'cursor'
+    ordering_query_param = 'ordering'
+    limit_query_param = 'limit'
+    mode_query_param = 'pagination'
+    mode_query_value = 'cursor'
+
+    default_limit = 10
+    max_limit = 100
+
+    # Each ordering must be backed by a ``(field, id)`` index on Product.
+    orderings = ('-created_at', 'created_at', '-price', 'price')
+    default_ordering = '-created_at'
+
+    invalid_cursor_message = 'Invalid cursor'
+
+    @classmethod
+    def is_requested(cls, request) -> bool:
+        """Keyset mode is opt-in, so existing offset clients keep working."""
+        params = request.query_params
+        return params.get(cls.mode_query_param) == cls.mode_query_value or cls.cursor_query_param in params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.get_page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Async counterpart of ``paginate_queryset`` for the ASGI views."""
+        return self.set_page([row async for row in self.get_page_queryset(queryset, request).aiterator()])
+
+    def get_page_queryset(self, queryset, request):
+        """Returns the range scan of the requested page plus one row to detect more pages."""
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.cursor = cursor = self.decode_cursor(request)
+        self.ordering = cursor['o'] if cursor else self.get_ordering(request)
+
+        field = self.ordering.lstrip('-')
+        descending = self.ordering.startswith('-')
+        self.reverse = bool(cursor and cursor['r'])
+        if self.reverse:
+            descending = not descending
+
+        if cursor is not None:
+            value = self.parse_value(field, cursor['v'])
+            lookup = 'lt' if descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{field}__{lookup}': value}) | Q(**{field: value, f'id__{lookup}': cursor['i']})
+            )
+
+        prefix = '-' if descending else ''
+        return queryset.order_by(f'{prefix}{field}', f'{prefix}id')[:self.limit + 1]
+
+    def set_page(self, rows: list) -> list:
+        has_more = len(rows) > self.limit
+        rows = rows[:self.limit]
+
+        if self.reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_limit(self, request) -> int:
+        try:
+            limit = int(request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return self.default_limit
+        if limit <= 0:
+            return self.default_limit
+        return min(limit, self.max_limit)
+
+    def get_ordering(self, request) -> str:
+        ordering = request.query_params.get(self.ordering_query_param)
+        if ordering in self.orderings:
+            return ordering
+        return self.default_ordering
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.build_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            url = self.request.build_absolute_uri()
+            return remove_query_param(url, self.cursor_query_param)
+        return self.build_link(self.page[0], reverse=True)
+
+    def build_link(self, row, reverse: bool) -> str:
+        field = self.ordering.lstrip('-')
+        # Rows are model instances or, on the read fast path, `.values()` dicts.
+        if isinstance(row, dict):
+            value, pk = row[field], row['id']
+        else:
+            value, pk = getattr(row, field), row.pk
+        token = self.encode_cursor({
+            'o': self.ordering,
+            'v': value.isoformat() if hasattr(value, 'isoformat') else str(value),
+            'i': pk,
+            'r': reverse,
+        })
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.mode_query_param, self.mode_query_value)
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    @staticmethod
+    def encode_cursor(payload: dict) -> str:
+        raw = json.dumps(payload, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+            payload = json.loads(raw)
+            if payload['o'] not in self.orderings:
+                raise ValueError
+            payload['i'] = int(payload['i'])
+            payload['r'] = bool(payload['r'])
+            self.parse_value(payload['o'].lstrip('-'), payload['v'])
+        except (binascii.Error, ValueError, TypeError, KeyError, InvalidOperation):
+            raise NotFound(self.invalid_cursor_message)
+        return payload
+
+    @staticmethod
+    def parse_value(field: str, value: str):
+        if field == 'price':
+            return Decimal(value)
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValueError(value)
+        return parsed
@@ -1,10 +1,14 @@
+from decimal import Decimal
 
 from rest_framework import serializers
 
 from apps.products.models import Product
+from apps.products.services.images import ProductImageService, storage_url
+from services.base.serializers import DynamicFieldsModelSerializer
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(DynamicFieldsModelSerializer):
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
@@ -14,8 +18,12 @@ class ProductSerializer(serializers.ModelSerializer):
             'price',
             'category',
             'image',
+            'image_variants',
         )
 
+    def get_image_variants(self, obj) -> dict:
+        return ProductImageService.get_variant_urls(obj.image_variants)
+
     def validate_price(self, value):
         if value <= 0:
             raise serializers.ValidationError("Цена должна быть больше нуля")
@@ -25,3 +33,54 @@ class ProductSerializer(serializers.ModelSerializer):
         if 'name' in data and len(data['name']) < 3:
             raise serializers.ValidationError("Название продукта должно содержать минимум 3 символа")
         return data
+
+
+class ProductValuesSerializer:
+    """Read-only fast path that builds ProductSerializer's output from ``.values()`` rows.
+
+    Skips model instantiation and the per-field serializer machinery; the
+    output must stay identical to ``ProductSerializer(instance).data``.
+    """
+    fields = ProductSerializer.Meta.fields
+    # Always read: not necessarily rendered, but pagination cursors need them.
+    key_columns = ('id', 'created_at', 'price')
+    price_quantum = Decimal('0.01')
+
+    @classmethod
+    def get_columns(cls, fields=None) -> tuple:
+        """Columns to read for the given fields, all of them by default."""
+        return cls.key_columns + tuple(name for name in fields or cls.fields if name not in cls.key_columns)
+
+    @classmethod
+    def to_representation(cls, row: dict, fields=None) -> dict:
+        return {name: cls.representers[name](row) for name in fields or cls.fields}
+
+    @classmethod
+    def many(cls, rows, fields=None) -> list:
+        return [cls.to_representation(row, fields) for row in rows]
+
+    representers = {
+        'name': lambda row: row['name'],
+        'description': lambda row: row['description'],
+        'price': lambda row: '{:f}'.format(row['price'].quantize(ProductValuesSerializer.price_quantum)),
+        'category': lambda row: row['category'],
+        'image': lambda row: storage_url(row['image']) if row['image'] else None,
+        'image_variants': lambda row: ProductImageService.get_variant_urls(row['image_variants']),
+    }
+
+
+class ProductBulkUpdateSerializer(ProductSerializer):
+    id = serializers.IntegerField()
+
+    class Meta(ProductSerializer.Meta):
+        fields = ('id',) + ProductSerializer.Meta.fields
+
+    def validate(self, data):
+        # `id` is required even though bulk updates are partial.
+        if 'id' not in data:
+            raise serializers.ValidationError({'id': "Обязательное поле."})
+        return super().validate(data)
+
+
+class ProductBulkDeleteSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
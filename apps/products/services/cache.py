@@ -0,0 +1,10 @@
+from django.conf import settings
+
+from services.cache.versioned import VersionedCache
+
+# Bumped by every product write service, see apps.products.services.products.
+product_cache = VersionedCache(
+    'products',
+    alias=settings.PRODUCT_CACHE_ALIAS,
+    timeout=settings.PRODUCT_CACHE_TIMEOUT,
+)
@@ -0,0 +1,133 @@
+from bisect import bisect_right
+from collections import Counter
+from typing import Iterable
+
+from django.conf import settings
+from django.db import connections, models, router, transaction
+from django.db.models import Case, Count, F, IntegerField, Sum, Value, When
+
+from apps.products.models import Category, Product, ProductFacet
+from services.base.services import BaseService
+
+
+class ProductFacetService(BaseService):
+    """
+    Service for category counts and the price histogram of products.
+
+    Counts live in the small ProductFacet table and are adjusted by the
+    product write services, so unfiltered and category-only facets never
+    touch the products table.
+    """
+    model = ProductFacet
+
+    @staticmethod
+    def bucket_of(price) -> int:
+        return bisect_right(settings.PRODUCT_PRICE_BUCKETS, price)
+
+    @staticmethod
+    def bucket_expression() -> Case:
+        """SQL equivalent of ``bucket_of('price')``."""
+        bounds = settings.PRODUCT_PRICE_BUCKETS
+        return Case(
+            *[When(price__lt=bound, then=Value(index)) for index, bound in enumerate(bounds)],
+            default=Value(len(bounds)),
+            output_field=IntegerField(),
+        )
+
+    @classmethod
+    def count_products(cls, queryset: models.QuerySet) -> Counter:
+        """Counts products per ``(category, bucket)`` with a single grouped query."""
+        rows = (
+            queryset.order_by()
+            .annotate(bucket=cls.bucket_expression())
+            .values('category', 'bucket')
+            .annotate(count=Count('id'))
+        )
+        return Counter({(row['category'], row['bucket']): row['count'] for row in rows})
+
+    @classmethod
+    def count_ids(cls, product_ids: Iterable[int], lock: bool = False) -> Counter:
+        """Counts the given products per ``(category, bucket)``.
+
+        With ``lock`` the rows stay locked until the transaction ends, so a
+        concurrent write to them waits and then counts their new state.
+        """
+        queryset = Product.objects.filter(pk__in=list(product_ids))
+        if not lock:
+            return cls.count_products(queryset)
+        # FOR UPDATE cannot be combined with GROUP BY, the locked rows are counted here.
+        rows = queryset.select_for_update().order_by('pk').values_list('category', 'price')
+        return Counter((category, cls.bucket_of(price)) for category, price in rows)
+
+    @classmethod
+    @transaction.atomic
+    def apply(cls, deltas: Counter) -> None:
+        """Adds the per ``(category, bucket)`` deltas to the stored counts."""
+        for (category, bucket), delta in sorted(deltas.items()):
+            if not delta:
+                continue
+            updated = cls.model.objects.filter(category=category, bucket=bucket).update(count=F('count') + delta)
+            if not updated:
+                facet, _ = cls.model.objects.get_or_create(category=category, bucket=bucket)
+                cls.model.objects.filter(pk=facet.pk).update(count=F('count') + delta)
+
+    @classmethod
+    def add(cls, category: str, price, delta: int = 1) -> None:
+        cls.apply(Counter({(category, cls.bucket_of(price)): delta}))
+
+    @classmethod
+    @transaction.atomic
+    def rebuild(cls) -> None:
+        """Recomputes every count from the products table.
+
+        On PostgreSQL the facet table is locked against writes first. A write
+        that already adjusted a count commits before the products are counted,
+        and one that has not waits and applies its delta to the new counts.
+        """
+        connection = connections[router.db_for_write(cls.model)]
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'LOCK TABLE {connection.ops.quote_name(cls.model._meta.db_table)} IN SHARE ROW EXCLUSIVE MODE'
+                )
+        counts = cls.count_products(Product.objects.all())
+        cls.model.objects.all().delete()
+        cls.model.objects.bulk_create([
+            cls.model(category=category, bucket=bucket, count=counts.get((category, bucket), 0))
+            for category in Category.values
+            for bucket in range(len(settings.PRODUCT_PRICE_BUCKETS) + 1)
+        ])
+
+    @classmethod
+    def get_facets(cls, category: str = None) -> dict:
+        """Facets of all products or of one category, read from the aggregate table."""
+        queryset = cls.model.objects.all()
+        if category:
+            queryset = queryset.filter(category=category)
+        rows = queryset.values('category', 'bucket').annotate(total=Sum('count'))
+        return cls.format(Counter({(row['category'], row['bucket']): row['total'] for row in rows}))
+
+    @classmethod
+    def get_facets_for(cls, queryset: models.QuerySet) -> dict:
+        """Facets of an arbitrary product queryset, computed with one grouped query."""
+        return cls.format(cls.count_products(queryset))
+
+    @staticmethod
+    def format(counts: Counter) -> dict:
+        bounds = settings.PRODUCT_PRICE_BUCKETS
+        categories = Counter()
+        buckets = Counter()
+        for (category, bucket), count in counts.items():
+            categories[category] += count
+            buckets[bucket] += count
+        return {
+            'categories': {category: categories[category] for category in Category.values if categories[category]},
+            'price_buckets': [
+                {
+                    'min': bounds[index - 1] if index else None,
+                    'max': bounds[index] if index < len(bounds) else None,
+                    'count': buckets[index],
+                }
+                for index in range(len(bounds) + 1)
+            ],
+        }
@@ -0,0 +1,142 @@
+import os
+from concurrent.futures import Executor, as_completed
+from functools import lru_cache, partial
+from io import BytesIO
+from typing import Iterable
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import models, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from apps.products.models import Product
+from apps.products.services.cache import product_cache
+from services.base.services import BaseService
+
+# Extension -> Pillow format of every generated variant.
+VARIANT_FORMATS = {
+    'jpeg': 'JPEG',
+    'webp': 'WEBP',
+}
+
+
+@lru_cache(maxsize=65536)
+def _filesystem_url(name: str) -> str:
+    return default_storage.url(name)
+
+
+def storage_url(name: str) -> str:
+    """``default_storage.url`` memoized for local storage, where URLs never change.
+
+    Remote storages may sign or expire URLs, so they are always asked.
+    """
+    if isinstance(default_storage, FileSystemStorage):
+        return _filesystem_url(name)
+    return default_storage.url(name)
+
+
+def render_variants(name: str, sizes: dict) -> dict:
+    """Renders the resized JPEG/WebP variants of a stored image.
+
+    Runs inside a worker process, so it only touches the storage, never the
+    database.
+
+    Args:
+        name: Storage name of the original image.
+        sizes: Variant label -> longest side in pixels.
+
+    Returns:
+        dict: Variant label -> extension -> storage name.
+    """
+    stem = os.path.splitext(os.path.basename(name))[0]
+    with default_storage.open(name) as source:
+        original = ImageOps.exif_transpose(Image.open(source))
+        original.load()
+
+    variants = {}
+    for label, size in sizes.items():
+        resized = original.copy()
+        resized.thumbnail((size, size), Image.Resampling.LANCZOS)
+        variants[label] = {}
+        for extension, image_format in VARIANT_FORMATS.items():
+            image = resized
+            if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            buffer = BytesIO()
+            image.save(buffer, image_format, quality=80)
+            variants[label][extension] = default_storage.save(
+                f'products/variants/{stem}_{label}.{extension}', ContentFile(buffer.getvalue())
+            )
+    return variants
+
+
+class ProductImageService(BaseService):
+    """
+    Service for generating product image variants outside the request path.
+    """
+    model = Product
+
+    @classmethod
+    def get_pending(cls) -> models.QuerySet:
+        """Products with an image but no variants yet, served by a partial index."""
+        return cls.model.objects.filter(image_variants={}, image__gt='').order_by('id')
+
+    @classmethod
+    def process_pending(cls, executor: Executor, batch_size: int) -> int:
+        """Renders variants for one batch of pending products on the executor.
+
+        Args:
+            executor: Pool the images are resized in.
+            batch_size: Maximum number of products taken from the queue.
+
+        Returns:
+            int: The number of processed products.
+        """
+        pending = list(cls.get_pending().values_list('id', 'image')[:batch_size])
+        futures = {
+            executor.submit(render_variants, name, settings.PRODUCT_IMAGE_SIZES): (product_id, name)
+            for product_id, name in pending
+        }
+        for future in as_completed(futures):
+            product_id, name = futures[future]
+            try:
+                variants = future.result()
+            except Exception as e:
+                # Recorded so a broken upload is not retried forever.
+                variants = {'error': str(e)}
+            # Skipped if the image was replaced while it was being processed.
+            updated = cls.model.objects.filter(pk=product_id, image=name).update(
+                image_variants=variants, updated_at=timezone.now()
+            )
+            if not updated:
+                cls.delete_variant_files(variants)
+        if pending:
+            transaction.on_commit(product_cache.bump)
+        return len(pending)
+
+    @staticmethod
+    def delete_variant_files(*variants: dict) -> None:
+        """Deletes the stored files of the given ``image_variants`` values."""
+        for value in variants:
+            for formats in value.values():
+                if isinstance(formats, dict):
+                    for name in formats.values():
+                        default_storage.delete(name)
+
+    @classmethod
+    def discard_variants(cls, variants: Iterable[dict]) -> None:
+        """Deletes the variant files once the transaction commits, e.g. after their image was replaced."""
+        variants = [value for value in variants if value]
+        if variants:
+            # robust: a storage error must not fail the write that already committed.
+            transaction.on_commit(partial(cls.delete_variant_files, *variants), robust=True)
+
+    @staticmethod
+    def get_variant_urls(variants: dict) -> dict:
+        return {
+            label: {extension: storage_url(name) for extension, name in formats.items()}
+            for label, formats in variants.items()
+            if isinstance(formats, dict)
+        }
@@ -1,6 +1,19 @@
+import csv
+import json
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.core.files.storage import default_storage
+from django.db import connections, models, router, transaction
+from django.db.models import Count, F, Max
 from django.http import JsonResponse
+from rest_framework import serializers
 
-from apps.products.models import Product
+from apps.products.models import Product, product_search_vector
+from apps.products.services.cache import product_cache
+from apps.products.services.facets import ProductFacetService
+from apps.products.services.images import ProductImageService
 from services.base.services import BaseService
 
 
@@ -10,6 +23,26 @@ class CreateProductService(BaseService):
     """
     model = Product
 
+    @classmethod
+    @transaction.atomic
+    def create(cls, **kwargs) -> Product:
+        product = super().create(**kwargs)
+        cls.model.objects.filter(pk=product.pk).update_search_vector()
+        ProductFacetService.add(product.category, product.price)
+        transaction.on_commit(product_cache.bump)
+        return product
+
+    @classmethod
+    @transaction.atomic
+    def bulk_create(cls, objects, batch_size: int = None) -> list[Product]:
+        products = super().bulk_create(objects, batch_size)
+        cls.model.objects.filter(pk__in=[product.pk for product in products]).update_search_vector()
+        ProductFacetService.apply(Counter(
+            (product.category, ProductFacetService.bucket_of(product.price)) for product in products
+        ))
+        transaction.on_commit(product_cache.bump)
+        return products
+
 
 class UpdateProductService(BaseService):
     """
@@ -17,6 +50,61 @@ class UpdateProductService(BaseService):
     """
     model = Product
 
+    @classmethod
+    @transaction.atomic
+    def update(cls, object_id: int, expected_version=None, **kwargs) -> Product:
+        if 'image' in kwargs:
+            # Queues the new image for `process_product_images`.
+            kwargs['image_variants'] = {}
+        vendor = connections[router.db_for_write(cls.model)].vendor
+        if vendor == 'postgresql' and ('name' in kwargs or 'description' in kwargs):
+            # Written by the same UPDATE as the changed columns.
+            kwargs['search_vector'] = product_search_vector(**kwargs)
+        moves_facet = 'category' in kwargs or 'price' in kwargs
+        changes_image = 'image' in kwargs
+        if moves_facet or changes_image:
+            # Locked until commit: a concurrent update has to wait and then sees
+            # the new bucket, so both cannot subtract the same old one, and no
+            # variants of the old image are stored after they were read here.
+            old = cls.model.objects.select_for_update().filter(pk=object_id).values(
+                'category', 'price', 'image_variants'
+            ).first()
+        product = super().update(object_id, expected_version, **kwargs)
+        if changes_image:
+            ProductImageService.discard_variants([old['image_variants']])
+        if moves_facet:
+            old_key = (old['category'], ProductFacetService.bucket_of(old['price']))
+            new_key = (product.category, ProductFacetService.bucket_of(product.price))
+            if old_key != new_key:
+                # One apply() locks both facet rows in key order, like every other write path.
+                ProductFacetService.apply(Counter({old_key: -1, new_key: 1}))
+        transaction.on_commit(product_cache.bump)
+        return product
+
+    @classmethod
+    @transaction.atomic
+    def bulk_update(cls, objects, batch_size: int = None) -> list[Product]:
+        objects = [{**item, 'image_variants': {}} if 'image' in item else item for item in objects]
+        moves_facet = any('category' in item or 'price' in item for item in objects)
+        if moves_facet:
+            # Locked like in `update`, two bulk calls cannot both subtract the same old buckets.
+            before = ProductFacetService.count_ids((item['id'] for item in objects), lock=True)
+        image_ids = [item['id'] for item in objects if 'image' in item]
+        if image_ids:
+            ProductImageService.discard_variants(
+                cls.model.objects.select_for_update().filter(pk__in=image_ids).order_by('pk')
+                .values_list('image_variants', flat=True)
+            )
+        products = super().bulk_update(objects, batch_size)
+        if any('name' in item or 'description' in item for item in objects):
+            cls.model.objects.filter(pk__in=[product.pk for product in products]).update_search_vector()
+        if moves_facet:
+            deltas = ProductFacetService.count_ids(product.pk for product in products)
+            deltas.subtract(before)
+            ProductFacetService.apply(deltas)
+        transaction.on_commit(product_cache.bump)
+        return products
+
 
 class DeleteProductService(BaseService):
     """
@@ -24,6 +112,32 @@ class DeleteProductService(BaseService):
     """
     model = Product
 
+    @classmethod
+    @transaction.atomic
+    def remove(cls, object_id: int) -> Product:
+        product = super().remove(object_id)
+        ProductFacetService.add(product.category, product.price, delta=-1)
+        transaction.on_commit(product_cache.bump)
+        return product
+
+    @classmethod
+    @transaction.atomic
+    def restore(cls, object_id: int) -> Product:
+        product = super().restore(object_id)
+        ProductFacetService.add(product.category, product.price)
+        transaction.on_commit(product_cache.bump)
+        return product
+
+    @classmethod
+    @transaction.atomic
+    def bulk_delete(cls, object_ids, batch_size: int = None) -> int:
+        object_ids = list(object_ids)
+        removed = ProductFacetService.count_ids(object_ids, lock=True)
+        deleted = super().bulk_delete(object_ids, batch_size)
+        ProductFacetService.apply(Counter({key: -count for key, count in removed.items()}))
+        transaction.on_commit(product_cache.bump)
+        return deleted
+
 
 class ListProductService(BaseService):
     """
@@ -31,6 +145,48 @@ class ListProductService(BaseService):
     """
     model = Product
 
+    @classmethod
+    def get_version(cls, queryset: models.QuerySet) -> tuple:
+        """Returns ``(last updated_at, row count)`` of a queryset in one aggregate query."""
+        result = queryset.order_by().aggregate(last_modified=Max('updated_at'), count=Count('id'))
+        return result['last_modified'], result['count']
+
+    @classmethod
+    async def aget_version(cls, queryset: models.QuerySet) -> tuple:
+        """Async counterpart of ``get_version``."""
+        result = await queryset.order_by().aaggregate(last_modified=Max('updated_at'), count=Count('id'))
+        return result['last_modified'], result['count']
+
+    @classmethod
+    def search(cls, queryset: models.QuerySet, query: str, top_k: int = None) -> models.QuerySet:
+        """Full-text search over the stored, GIN-indexed search vector.
+
+        Only the ``top_k`` best ranked matches are kept, so the rank sort and
+        the pagination count are bounded no matter how many rows match.
+
+        Args:
+            queryset: The (already filtered) queryset to search in.
+            query: Raw user input, parsed with ``plainto_tsquery``.
+            top_k: Maximum number of results, ``PRODUCT_SEARCH_TOP_K`` by default.
+
+        Returns:
+            QuerySet: Matches annotated with ``rank`` and ordered by it.
+        """
+        top_k = top_k or settings.PRODUCT_SEARCH_TOP_K
+        search_query = SearchQuery(query)
+        rank = SearchRank(F('search_vector'), search_query)
+        top_ids = (
+            queryset.filter(search_vector=search_query)
+            .annotate(rank=rank)
+            .order_by('-rank', 'id')
+            .values('id')[:top_k]
+        )
+        return (
+            cls.model.objects.filter(pk__in=top_ids)
+            .annotate(rank=rank)
+            .order_by('-rank', 'id')
+        )
+
 
 class RetrieveProductService(BaseService):
     """
@@ -38,6 +194,106 @@ class RetrieveProductService(BaseService):
     """
     model = Product
 
+    @classmethod
+    def get_values_by_id(cls, object_id: int, fields) -> dict:
+        """Retrieves the given columns of a product as a dict, without building a model instance.
+
+        Raises:
+            ValidationError: If the instance does not exist.
+        """
+        values = cls.model.objects.filter(pk=object_id).values(*fields).first()
+        if values is None:
+            raise serializers.ValidationError(f"{cls.model.__name__} does not exist.")
+        return values
+
+    @classmethod
+    async def aget_values_by_id(cls, object_id: int, fields) -> dict:
+        """Async counterpart of ``get_values_by_id``.
+
+        Raises:
+            ValidationError: If the instance does not exist.
+        """
+        try:
+            return await cls.model.objects.filter(pk=object_id).values(*fields).aget()
+        except cls.model.DoesNotExist:
+            raise serializers.ValidationError(f"{cls.model.__name__} does not exist.")
+
+    @classmethod
+    def get_last_modified(cls, object_id: int):
+        """Returns ``updated_at`` of a product without loading the row, ``None`` if it does not exist."""
+        return cls.model.objects.filter(pk=object_id).values_list('updated_at', flat=True).first()
+
+    @classmethod
+    async def aget_last_modified(cls, object_id: int):
+        """Async counterpart of ``get_last_modified``."""
+        return await cls.model.objects.filter(pk=object_id).values_list('updated_at', flat=True).afirst()
+
+
+class _Echo:
+    """File-like object that hands back what csv.writer writes to it."""
+
+    def write(self, value):
+        return value
+
+
+class ExportProductService(BaseService):
+    """
+    Service for streaming products out as NDJSON or CSV.
+    """
+    model = Product
+    fields = ('id', 'name', 'description', 'price', 'category', 'image')
+
+    @classmethod
+    def to_row(cls, values: dict) -> dict:
+        image = values['image']
+        return {
+            **values,
+            'price': str(values['price']),
+            'image': default_storage.url(image) if image else None,
+        }
+
+    @classmethod
+    def iter_rows(cls, queryset: models.QuerySet):
+        """Yields export rows through a server-side cursor, ``EXPORT_CHUNK_SIZE`` rows at a time."""
+        rows = queryset.values(*cls.fields).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+        for values in rows:
+            yield cls.to_row(values)
+
+    @classmethod
+    async def aiter_rows(cls, queryset: models.QuerySet):
+        """Async variant of ``iter_rows`` for the ASGI server.
+
+        Each chunk is still fetched in a ``sync_to_async`` thread, but the
+        response streams from the event loop without buffering the export.
+        """
+        rows = queryset.values(*cls.fields).aiterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+        async for values in rows:
+            yield cls.to_row(values)
+
+    @classmethod
+    def iter_ndjson(cls, queryset: models.QuerySet):
+        for row in cls.iter_rows(queryset):
+            yield json.dumps(row, ensure_ascii=False) + '\n'
+
+    @classmethod
+    async def aiter_ndjson(cls, queryset: models.QuerySet):
+        async for row in cls.aiter_rows(queryset):
+            yield json.dumps(row, ensure_ascii=False) + '\n'
+
+    @classmethod
+    def iter_csv(cls, queryset: models.QuerySet):
+        writer = csv.writer(_Echo())
+        yield writer.writerow(cls.fields)
+        for row in cls.iter_rows(queryset):
+            yield writer.writerow(row.values())
+
+    @classmethod
+    async def aiter_csv(cls, queryset: models.QuerySet):
+        writer = csv.writer(_Echo())
+        yield writer.writerow(cls.fields)
+        async for row in cls.aiter_rows(queryset):
+            yield writer.writerow(row.values())
+
 
 class ProductService:
     def __init__(self,
@@ -46,18 +302,22 @@ class ProductService:
                  delete_service: DeleteProductService,
                  list_service: ListProductService,
                  retrieve_service: RetrieveProductService,
+                 export_service: ExportProductService,
+                 facet_service: ProductFacetService,
                  ):
         self.create_service = create_service
         self.update_service = update_service
         self.delete_service = delete_service
         self.list_service = list_service
         self.retrieve_service = retrieve_service
+        self.export_service = export_service
+        self.facet_service = facet_service
 
     def create_product(self, **kwargs) -> Product:
         return self.create_service.create(**kwargs)
 
-    def update_product(self, product_id: int, **kwargs) -> Product:
-        return self.update_service.update(product_id, **kwargs)
+    def update_product(self, product_id: int, expected_version=None, **kwargs) -> Product:
+        return self.update_service.update(product_id, expected_version, **kwargs)
 
     def delete_product(self, product_id: int) -> JsonResponse:
         return self.delete_service.delete(product_id)
@@ -65,5 +325,8 @@ class ProductService:
     def list_products(self):
         return self.list_service.get_all()
 
+    def search_products(self, queryset, query: str):
+        return self.list_service.search(queryset, query)
+
     def retrieve_product(self, product_id: int):
         return self.retrieve_service.get_by_id(product_id)
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from apps.products.models import Product
+from apps.products.services.images import ProductImageService
+
+
+@receiver(post_delete, sender=Product)
+def delete_image_variants(sender, instance, **kwargs):
+    """Purged products take their generated image variants with them."""
+    ProductImageService.discard_variants([instance.image_variants])
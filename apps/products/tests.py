@@ -1,3 +1,945 @@
-from django.test import TestCase
+import csv
+import json
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection, router
+from django.http import HttpResponse
+from django.conf import settings
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from prometheus_client import REGISTRY
+from rest_framework import serializers, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, APITestCase, APITransactionTestCase, force_authenticate
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from Product.middleware import ReplicaPinMiddleware
+from apps.products.models import Product
+from apps.products.serializers import ProductSerializer
+from apps.products.services.cache import product_cache
+from apps.products.services.images import ProductImageService
+from apps.products.services.products import DeleteProductService, RetrieveProductService, UpdateProductService
+from apps.products.views import AsyncProductViewSet, ProductViewSet
+from apps.users.models import User
+from services.base.services import unit_of_work_scope
+from services.throttling.throttles import SlidingWindowRateThrottle
+
+# The tests do not need the Redis server of the default settings.
+LOCAL_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class ProductAPITestCase(APITestCase):
+    """Signs in a regular user and starts every test with an empty cache."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='user@example.com', username='user', password='password123')
+        self.authenticate(self.user)
+
+    def authenticate(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+
+    def create_product(self, **data) -> Product:
+        data = {'name': 'Product', 'price': '10.00', 'category': 'books', **data}
+        response = self.client.post(reverse('product-list'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        return Product.objects.latest('id')
+
+    def get_category_counts(self) -> dict:
+        return self.client.get(reverse('product-facets')).data['categories']
+
+
+class KeysetPaginationTests(ProductAPITestCase):
+
+    def test_next_links_walk_every_product_once_in_order(self):
+        for number, price in enumerate(['5.00', '1.00', '3.00', '1.00', '2.00', '5.00', '4.00']):
+            self.create_product(name=f'Product {number}', price=price)
+
+        url = reverse('product-list') + '?pagination=cursor&ordering=price&limit=3'
+        names = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data['results']), 3)
+            names += [row['name'] for row in response.data['results']]
+            url = response.data['next']
+
+        expected = list(Product.objects.order_by('price', 'id').values_list('name', flat=True))
+        self.assertEqual(names, expected)
+
+    def test_previous_link_returns_the_previous_page(self):
+        for number in range(5):
+            self.create_product(name=f'Product {number}')
+        first = self.client.get(reverse('product-list') + '?pagination=cursor&limit=2')
+        second = self.client.get(first.data['next'])
+
+        previous = self.client.get(second.data['previous'])
+
+        self.assertEqual(previous.data['results'], first.data['results'])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(reverse('product-list') + '?cursor=not-a-cursor')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_search_cannot_be_combined_with_ordering_or_cursor(self):
+        for query in ('search=phone&ordering=price', 'search=phone&pagination=cursor', 'search=phone&cursor=x'):
+            with self.subTest(query=query):
+                response = self.client.get(reverse('product-list') + '?' + query)
+
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn('search', response.data)
+
+    def test_orders_keyset_pages_cannot_follow_are_rejected(self):
+        for query, param in (('name_fuzzy=lamp', 'name_fuzzy'), ('ordering=price,-created_at', 'ordering')):
+            for mode in ('pagination=cursor', 'cursor=x'):
+                with self.subTest(query=query, mode=mode):
+                    response = self.client.get(reverse('product-list') + f'?{query}&{mode}')
+
+                    self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                    self.assertIn(param, response.data)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Full-text search needs PostgreSQL.')
+class SearchTests(ProductAPITestCase):
+
+    def search(self, query: str, **params) -> list:
+        response = self.client.get(reverse('product-list'), {'search': query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row['name'] for row in response.data['results']]
+
+    def test_name_matches_rank_above_description_matches(self):
+        self.create_product(name='Cable', description='Fits every phone')
+        self.create_product(name='Phone', description='A smartphone')
+        self.create_product(name='Lamp', description='A desk lamp')
+
+        self.assertEqual(self.search('phone'), ['Phone', 'Cable'])
+
+    def test_updated_product_is_found_by_its_new_name(self):
+        product = self.create_product(name='Lamp')
+        self.client.put(reverse('product-detail', args=[product.pk]), {'name': 'Phone'}, format='json')
+
+        self.assertEqual(self.search('phone'), ['Phone'])
+        self.assertEqual(self.search('lamp'), [])
+
+    @override_settings(PRODUCT_SEARCH_TOP_K=2)
+    def test_results_are_capped_at_top_k(self):
+        for number in range(3):
+            self.create_product(name=f'Phone {number}')
+
+        response = self.client.get(reverse('product-list'), {'search': 'phone'})
+
+        self.assertEqual(response.data['count'], 2)
+
+
+class TextFilterTests(ProductAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.create_product(name='Wireless Headphones', description='Noise cancelling')
+        self.create_product(name='Phone Case', description='Fits every model')
+        self.create_product(name='Desk Lamp', description='Warm light')
+
+    def filter(self, **params) -> list:
+        response = self.client.get(reverse('product-list'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return sorted(row['name'] for row in response.data['results'])
+
+    def test_name_substring_ignores_case(self):
+        self.assertEqual(self.filter(name__icontains='PHONE'), ['Phone Case', 'Wireless Headphones'])
+
+    def test_description_substring_ignores_case(self):
+        self.assertEqual(self.filter(description__icontains='warm'), ['Desk Lamp'])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Trigram similarity needs PostgreSQL.')
+    def test_fuzzy_name_tolerates_typos(self):
+        self.assertEqual(self.filter(name_fuzzy='Desk Lmap'), ['Desk Lamp'])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Trigram similarity needs PostgreSQL.')
+    def test_fuzzy_name_ranks_closest_match_first(self):
+        self.create_product(name='Desk Lamps Set')
+
+        response = self.client.get(reverse('product-list'), {'name_fuzzy': 'Desk Lamp'})
+
+        self.assertEqual([row['name'] for row in response.data['results']], ['Desk Lamp', 'Desk Lamps Set'])
+
+
+class VersionCheckTests(ProductAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.product = self.create_product(name='Product')
+        self.url = reverse('product-detail', args=[self.product.pk])
+        self.data = {'name': 'Renamed', 'price': '12.00', 'category': 'books'}
+
+    def test_update_with_current_etag_succeeds(self):
+        etag = self.client.get(self.url).headers['ETag']
+
+        response = self.client.put(self.url, self.data, format='json', HTTP_IF_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_update_with_stale_etag_is_rejected(self):
+        etag = self.client.get(self.url).headers['ETag']
+        self.client.put(self.url, self.data, format='json', HTTP_IF_MATCH=etag)
+
+        response = self.client.put(self.url, {**self.data, 'name': 'Lost update'}, format='json', HTTP_IF_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.name, 'Renamed')
+
+    def test_etag_of_another_product_is_rejected(self):
+        other = self.create_product(name='Other')
+        etag = self.client.get(reverse('product-detail', args=[other.pk])).headers['ETag']
+
+        response = self.client.put(self.url, self.data, format='json', HTTP_IF_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+
+class SoftDeleteTests(ProductAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.product = self.create_product(name='Deleted', category='toys')
+        self.create_product(name='Kept', category='toys')
+
+    def test_deleted_product_is_hidden_and_not_counted(self):
+        response = self.client.delete(reverse('product-detail', args=[self.product.pk]))
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        names = [row['name'] for row in self.client.get(reverse('product-list')).data['results']]
+        self.assertEqual(names, ['Kept'])
+        self.assertEqual(self.get_category_counts(), {'toys': 1})
+        self.assertIsNotNone(Product.all_objects.get(pk=self.product.pk).deleted_at)
+
+    def test_admin_restores_deleted_product(self):
+        self.client.delete(reverse('product-detail', args=[self.product.pk]))
+        admin = User.objects.create_superuser(email='admin@example.com', username='admin', password='password123')
+        self.authenticate(admin)
+
+        response = self.client.post(reverse('product-restore', args=[self.product.pk]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['name'], 'Deleted')
+        self.assertEqual(self.get_category_counts(), {'toys': 2})
+
+    def test_only_admins_restore(self):
+        self.client.delete(reverse('product-detail', args=[self.product.pk]))
+
+        response = self.client.post(reverse('product-restore', args=[self.product.pk]))
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(Product.objects.filter(pk=self.product.pk).exists())
+
+    def test_price_change_moves_facet_bucket(self):
+        self.client.put(
+            reverse('product-detail', args=[self.product.pk]),
+            {'name': 'Deleted', 'price': '5000.00', 'category': 'books'},
+            format='json',
+        )
+
+        facets = self.client.get(reverse('product-facets')).data
+        self.assertEqual(facets['categories'], {'toys': 1, 'books': 1})
+        self.assertEqual(facets['price_buckets'][-1]['count'], 1)
+
+
+class BulkUpdateTests(ProductAPITestCase):
+
+    def test_items_are_updated_in_input_order(self):
+        first = self.create_product(name='First')
+        second = self.create_product(name='Second')
+
+        response = self.client.patch(
+            reverse('product-bulk-update'),
+            [{'id': second.pk, 'price': '2.00'}, {'id': first.pk, 'name': 'Renamed'}],
+            format='json',
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['id'] for row in response.data], [second.pk, first.pk])
+        self.assertEqual(Product.objects.get(pk=first.pk).name, 'Renamed')
+
+    def test_missing_and_deleted_ids_get_per_item_errors(self):
+        product = self.create_product(name='Alive')
+        deleted = self.create_product(name='Deleted')
+        self.client.delete(reverse('product-detail', args=[deleted.pk]))
+
+        response = self.client.patch(
+            reverse('product-bulk-update'),
+            [{'id': product.pk, 'price': '2.00'}, {'id': deleted.pk, 'price': '3.00'}, {'id': 0, 'price': '4.00'}],
+            format='json',
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(response.data), 3)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('id', response.data[1])
+        self.assertIn('id', response.data[2])
+        self.assertEqual(str(Product.objects.get(pk=product.pk).price), '10.00')
+
+    def test_item_without_id_is_rejected(self):
+        response = self.client.patch(reverse('product-bulk-update'), [{'price': '2.00'}], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('id', response.data[0])
+
+
+@mock.patch.object(SlidingWindowRateThrottle, 'THROTTLE_RATES', {'write': '2/min'})
+class WriteThrottleTests(ProductAPITestCase):
+
+    def test_writes_over_the_limit_are_rejected(self):
+        self.create_product(name='First')
+        self.create_product(name='Second')
+
+        response = self.client.post(
+            reverse('product-list'), {'name': 'Third', 'price': '1.00', 'category': 'books'}, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response.headers)
+        self.assertFalse(Product.objects.filter(name='Third').exists())
+
+    def test_reads_are_not_limited(self):
+        self.create_product(name='First')
+        self.create_product(name='Second')
+
+        response = self.client.get(reverse('product-list'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_limit_is_per_user(self):
+        self.create_product(name='First')
+        self.create_product(name='Second')
+        self.authenticate(User.objects.create_user(email='other@example.com', username='other', password='password123'))
+
+        self.create_product(name='Third')
+
+
+class ResponseCacheTests(ProductAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.product = self.create_product(name='Cached')
+        self.detail_url = reverse('product-detail', args=[self.product.pk])
+
+    def write(self, method: str, url: str, data=None):
+        """Sends a write and runs its on-commit callbacks, where the cache version is bumped."""
+        version = product_cache.version()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertLess(response.status_code, 300, response.data)
+        self.assertGreater(product_cache.version(), version)
+        return response
+
+    def get_names(self) -> list:
+        return [row['name'] for row in self.client.get(reverse('product-list')).data['results']]
+
+    def test_repeated_reads_are_served_without_queries(self):
+        for url in (reverse('product-list'), self.detail_url):
+            with self.subTest(url=url):
+                first = self.client.get(url)
+
+                with self.assertNumQueries(0):
+                    second = self.client.get(url)
+
+                self.assertEqual(second.status_code, status.HTTP_200_OK)
+                self.assertEqual(second.data, first.data)
+
+    def test_create_refreshes_the_list(self):
+        self.get_names()
+
+        self.write('post', reverse('product-list'), {'name': 'Created', 'price': '1.00', 'category': 'books'})
+
+        self.assertEqual(self.get_names(), ['Created', 'Cached'])
+
+    def test_update_refreshes_the_list_and_the_product(self):
+        self.get_names()
+        self.client.get(self.detail_url)
+
+        self.write('put', self.detail_url, {'name': 'Renamed'})
+
+        self.assertEqual(self.get_names(), ['Renamed'])
+        self.assertEqual(self.client.get(self.detail_url).data['name'], 'Renamed')
+
+    def test_delete_refreshes_the_list(self):
+        self.get_names()
+
+        self.write('delete', self.detail_url)
+
+        self.assertEqual(self.get_names(), [])
+
+    def test_bulk_writes_refresh_the_list(self):
+        writes = [
+            (
+                'post', 'product-bulk-create',
+                [{'name': 'Bulk', 'price': '1.00', 'category': 'books'}], ['Bulk', 'Cached'],
+            ),
+            ('patch', 'product-bulk-update', [{'id': self.product.pk, 'name': 'Renamed'}], ['Bulk', 'Renamed']),
+            ('post', 'product-bulk-delete', {'ids': [self.product.pk]}, ['Bulk']),
+        ]
+        for method, url_name, data, expected in writes:
+            with self.subTest(url_name=url_name):
+                self.get_names()
+
+                self.write(method, reverse(url_name), data)
+
+                self.assertEqual(self.get_names(), expected)
+
+
+class ConditionalGetTests(ProductAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.product = self.create_product(name='Product')
+        # Last-Modified has a resolution of one second, the write in a test must come later.
+        Product.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        self.urls = (reverse('product-list'), reverse('product-detail', args=[self.product.pk]))
+
+    def rename(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(self.urls[1], {'name': 'Renamed'}, format='json')
+
+    def test_matching_etag_returns_304(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.client.get(url).headers['ETag']
+
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+                self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+                self.assertEqual(response.headers['ETag'], etag)
+
+    def test_unchanged_since_last_modified_returns_304(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                last_modified = self.client.get(url).headers['Last-Modified']
+
+                response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+
+                self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_write_makes_validators_stale(self):
+        validators = {url: self.client.get(url).headers for url in self.urls}
+
+        self.rename()
+
+        for url, headers in validators.items():
+            for header, value in (
+                ('HTTP_IF_NONE_MATCH', headers['ETag']),
+                ('HTTP_IF_MODIFIED_SINCE', headers['Last-Modified']),
+            ):
+                with self.subTest(url=url, header=header):
+                    response = self.client.get(url, **{header: value})
+
+                    self.assertEqual(response.status_code, status.HTTP_200_OK)
+                    self.assertIn('Renamed', response.content.decode())
+
+
+class FastPathTests(ProductAPITestCase):
+
+    def test_list_body_matches_product_serializer(self):
+        Product.objects.create(name='Plain', price=Decimal('5'), category='books')
+        Product.objects.create(
+            name='Лампа\u2028', description='Описание', price=Decimal('1234.5'), category='toys',
+            image='products/lamp.jpg',
+            image_variants={'thumb': {'jpeg': 'products/variants/lamp_thumb.jpeg'}, 'error': 'skipped'},
+        )
+        products = Product.objects.order_by('-created_at', '-id')
+
+        for query in ('', '?pagination=cursor'):
+            with self.subTest(query=query):
+                response = self.client.get(reverse('product-list') + query)
+
+                # The stock serializer and renderer, with the envelope of the response.
+                envelope = json.loads(response.content)
+                expected = JSONRenderer().render({**envelope, 'results': ProductSerializer(products, many=True).data})
+                self.assertEqual(response.content, expected)
+
+
+class SparseFieldsetTests(ProductAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.product = self.create_product(name='Product', description='Described')
+        self.urls = (reverse('product-list'), reverse('product-detail', args=[self.product.pk]))
+
+    def test_only_requested_fields_are_returned(self):
+        list_response = self.client.get(self.urls[0], {'fields': 'price,name'})
+        retrieve_response = self.client.get(self.urls[1], {'fields': 'price,name'})
+
+        self.assertEqual(list_response.data['results'], [{'name': 'Product', 'price': '10.00'}])
+        self.assertEqual(retrieve_response.data, {'name': 'Product', 'price': '10.00'})
+
+    def test_unknown_fields_are_rejected(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url, {'fields': 'name,deleted_at'})
+
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn('fields', response.data)
+
+
+class ExportTests(ProductAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        for number in range(3):
+            self.create_product(name=f'Book {number}', category='books')
+        self.create_product(name='Toy', category='toys')
+
+    def export(self, **params):
+        response = self.client.get(reverse('product-export'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_ndjson_export_streams_one_line_per_product(self):
+        response, body = self.export()
+
+        self.assertEqual(response.headers['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(response.headers['Content-Disposition'], 'attachment; filename="products.ndjson"')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(sorted(row['name'] for row in rows), ['Book 0', 'Book 1', 'Book 2', 'Toy'])
+        self.assertEqual(rows[0]['price'], '10.00')
+
+    def test_csv_export_has_a_header_row(self):
+        response, body = self.export(file_format='csv')
+
+        self.assertEqual(response.headers['Content-Type'], 'text/csv')
+        self.assertEqual(response.headers['Content-Disposition'], 'attachment; filename="products.csv"')
+        rows = list(csv.DictReader(body.splitlines()))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(set(rows[0]), {'id', 'name', 'description', 'price', 'category', 'image'})
+
+    def test_filters_apply_to_exported_rows(self):
+        for file_format in ('ndjson', 'csv'):
+            with self.subTest(file_format=file_format):
+                _, body = self.export(file_format=file_format, category='toys')
+
+                lines = body.splitlines()
+                self.assertEqual(len(lines), 2 if file_format == 'csv' else 1)
+                self.assertIn('Toy', lines[-1])
+
+
+class ImportProductsTests(ProductAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.product = self.create_product(name='Existing')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def import_csv(self, *rows) -> Path:
+        source = self.directory / 'products.csv'
+        with open(source, 'w', encoding='utf-8', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['id', 'name', 'description', 'price', 'category', 'image'])
+            writer.writerows(rows)
+        rejects = self.directory / 'rejects.ndjson'
+        call_command('import_products', str(source), rejects=str(rejects), stdout=StringIO())
+        return rejects
+
+    def test_rows_are_inserted_and_updated(self):
+        self.import_csv(
+            [self.product.pk, 'Updated', '', '20.00', 'books', ''],
+            ['', 'Imported', 'New', '30.00', 'toys', ''],
+        )
+
+        self.assertEqual(Product.objects.get(pk=self.product.pk).name, 'Updated')
+        self.assertEqual(str(Product.objects.get(name='Imported').price), '30.00')
+        self.assertEqual(Product.objects.count(), 2)
+        self.assertEqual(self.get_category_counts(), {'books': 1, 'toys': 1})
+
+    def test_rejected_rows_are_reported(self):
+        rejects = self.import_csv(
+            ['', 'Valid', '', '5.00', 'books', ''],
+            ['', 'Negative', '', '-1.00', 'books', ''],
+            ['', 'Unknown category', '', '5.00', 'cars', ''],
+        )
+
+        reported = [json.loads(line) for line in rejects.read_text(encoding='utf-8').splitlines()]
+        self.assertEqual([row['record'] for row in reported], [2, 3])
+        self.assertTrue(Product.objects.filter(name='Valid').exists())
+        self.assertFalse(Product.objects.filter(name__in=['Negative', 'Unknown category']).exists())
+
+    @skipUnless(connection.vendor == 'postgresql', 'The id sequence is only reset on PostgreSQL.')
+    def test_id_sequence_continues_after_explicit_ids(self):
+        self.import_csv([self.product.pk + 1000, 'Explicit id', '', '5.00', 'books', ''])
+
+        created = self.create_product(name='Created')
+
+        self.assertGreater(created.pk, self.product.pk + 1000)
+
+
+class ImageVariantTests(ProductAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name, PRODUCT_IMAGE_SIZES={'thumb': 20})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        image = default_storage.save('products/photo.png', ContentFile(self.make_png()))
+        self.product = Product.objects.create(name='Photo', price=Decimal('1.00'), category='toys', image=image)
+
+    @staticmethod
+    def make_png() -> bytes:
+        buffer = BytesIO()
+        Image.new('RGBA', (80, 40), (255, 0, 0, 128)).save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    def get_variant_files(self) -> list:
+        variants = Product.all_objects.get(pk=self.product.pk).image_variants
+        return [name for formats in variants.values() for name in formats.values()]
+
+    def process_pending(self) -> int:
+        # Threads instead of the command's processes, so the overridden settings apply.
+        with ThreadPoolExecutor(max_workers=1) as executor, self.captureOnCommitCallbacks(execute=True):
+            return ProductImageService.process_pending(executor, batch_size=10)
+
+    def test_variant_urls_are_returned_after_processing(self):
+        self.assertEqual(self.client.get(reverse('product-detail', args=[self.product.pk])).data['image_variants'], {})
+
+        self.assertEqual(self.process_pending(), 1)
+
+        variants = self.client.get(reverse('product-detail', args=[self.product.pk])).data['image_variants']
+        self.assertEqual(set(variants), {'thumb'})
+        self.assertEqual(set(variants['thumb']), {'jpeg', 'webp'})
+        name = Product.objects.get(pk=self.product.pk).image_variants['thumb']['webp']
+        self.assertEqual(variants['thumb']['webp'], default_storage.url(name))
+        with default_storage.open(name) as file:
+            self.assertEqual(Image.open(file).size, (20, 10))
+
+    def test_processed_products_leave_the_queue(self):
+        self.process_pending()
+
+        self.assertEqual(self.process_pending(), 0)
+
+    def test_replaced_image_drops_the_old_variants(self):
+        self.process_pending()
+        old_files = self.get_variant_files()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(
+                reverse('product-detail', args=[self.product.pk]),
+                {'image': SimpleUploadedFile('new.png', self.make_png(), content_type='image/png')},
+                format='multipart',
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['image_variants'], {})
+        self.assertEqual([name for name in old_files if default_storage.exists(name)], [])
+
+    def test_purged_product_drops_its_variants(self):
+        self.process_pending()
+        files = self.get_variant_files()
+        Product.objects.filter(pk=self.product.pk).soft_delete()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('purge_deleted', '--once', '--days', '0', '--pause', '0', stdout=StringIO())
+
+        self.assertFalse(Product.all_objects.filter(pk=self.product.pk).exists())
+        self.assertEqual([name for name in files if default_storage.exists(name)], [])
+
+
+class AsyncViewSetTests(ProductAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        for number in range(3):
+            self.create_product(name=f'Product {number}', price=f'{number + 1}.00')
+        self.product = Product.objects.latest('id')
+
+    def make_request(self, path: str, params: dict):
+        request = APIRequestFactory().get(path, params)
+        force_authenticate(request, user=self.user)
+        return request
+
+    async def assertSameResponse(self, actions: dict, path: str, params: dict, **kwargs):
+        sync_view = sync_to_async(ProductViewSet.as_view(actions))
+        expected = await sync_view(self.make_request(path, params), **kwargs)
+        # Otherwise the async view would be served the response cached by the sync one.
+        await sync_to_async(cache.clear)()
+
+        response = await AsyncProductViewSet.as_view(actions)(self.make_request(path, params), **kwargs)
+
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.data, expected.data)
+        self.assertEqual(response.headers['ETag'], expected.headers['ETag'])
+
+    async def test_list_matches_the_sync_list(self):
+        for params in ({}, {'ordering': 'price', 'limit': 2}, {'fields': 'name', 'category': 'books'}):
+            with self.subTest(params=params):
+                await self.assertSameResponse({'get': 'list'}, reverse('product-list'), params)
+
+    async def test_retrieve_matches_the_sync_retrieve(self):
+        await self.assertSameResponse(
+            {'get': 'retrieve'}, reverse('product-detail', args=[self.product.pk]), {}, pk=str(self.product.pk)
+        )
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaPinTests(SimpleTestCase):
+    """Routing decisions only, no query reaches the (absent) replica."""
+
+    def handle(self, request, write: bool = False) -> tuple:
+        """Runs a request through ReplicaPinMiddleware, returns its read alias and response."""
+        aliases = []
+
+        def get_response(request):
+            if write:
+                router.db_for_write(Product)
+            aliases.append(router.db_for_read(Product))
+            return HttpResponse()
+
+        response = ReplicaPinMiddleware(get_response)(request)
+        return aliases[0], response
+
+    def test_reads_go_to_a_replica(self):
+        alias, response = self.handle(RequestFactory().get('/api/products/'))
+
+        self.assertEqual(alias, 'replica1')
+        self.assertNotIn(ReplicaPinMiddleware.cookie_name, response.cookies)
+
+    def test_reads_after_a_write_go_to_the_primary(self):
+        alias, response = self.handle(RequestFactory().post('/api/products/'), write=True)
+        self.assertEqual(alias, DEFAULT_DB_ALIAS)
+        cookie = response.cookies[ReplicaPinMiddleware.cookie_name]
+
+        request = RequestFactory().get('/api/products/')
+        request.COOKIES[cookie.key] = cookie.value
+        alias, _ = self.handle(request)
+
+        self.assertEqual(alias, DEFAULT_DB_ALIAS)
+
+    def test_forged_pin_is_ignored(self):
+        request = RequestFactory().get('/api/products/')
+        request.COOKIES[ReplicaPinMiddleware.cookie_name] = '1'
+
+        alias, _ = self.handle(request)
+
+        self.assertEqual(alias, 'replica1')
+
+
+class RequestMetricsTests(ProductAPITestCase):
+
+    @staticmethod
+    def get_sample(name: str, **labels) -> float:
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_requests_are_recorded_per_route(self):
+        labels = {'route': 'product-list'}
+        requests = self.get_sample('http_request_duration_seconds_count', method='GET', status='200', **labels)
+        queries = self.get_sample('http_request_sql_queries_sum', **labels)
+
+        self.client.get(reverse('product-list'))
+
+        self.assertEqual(
+            self.get_sample('http_request_duration_seconds_count', method='GET', status='200', **labels),
+            requests + 1,
+        )
+        self.assertGreater(self.get_sample('http_request_sql_queries_sum', **labels), queries)
+
+    @override_settings(N_PLUS_ONE_THRESHOLD=1)
+    def test_repeated_queries_are_reported(self):
+        reported = self.get_sample('http_request_n_plus_one_total', route='product-list')
+
+        with self.assertLogs('Product.middleware', 'WARNING'):
+            self.client.get(reverse('product-list'))
+
+        self.assertEqual(self.get_sample('http_request_n_plus_one_total', route='product-list'), reported + 1)
+
+    def test_metrics_endpoint_exposes_the_routes(self):
+        self.client.get(reverse('product-list'))
+
+        response = self.client.get(reverse('metrics'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(b'route="product-list"', response.content)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_endpoint_checks_the_token(self):
+        self.client.credentials()
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_403_FORBIDDEN)
+
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class UnitOfWorkTests(ProductAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.product = self.create_product(name='Product')
+
+    def test_same_instance_is_returned_within_a_scope(self):
+        with unit_of_work_scope():
+            first = RetrieveProductService.get_by_id(self.product.pk)
+
+            with self.assertNumQueries(0):
+                second = UpdateProductService.get_by_id(str(self.product.pk))
+
+        self.assertIs(second, first)
+
+    def test_scopes_do_not_share_instances(self):
+        with unit_of_work_scope():
+            first = RetrieveProductService.get_by_id(self.product.pk)
+        with unit_of_work_scope():
+            second = RetrieveProductService.get_by_id(self.product.pk)
+
+        self.assertIsNot(second, first)
+
+    def test_writes_keep_the_map_in_step(self):
+        with unit_of_work_scope():
+            RetrieveProductService.get_by_id(self.product.pk)
+
+            UpdateProductService.update(self.product.pk, name='Renamed')
+            self.assertEqual(RetrieveProductService.get_by_id(self.product.pk).name, 'Renamed')
+
+            DeleteProductService.remove(self.product.pk)
+            with self.assertRaises(serializers.ValidationError):
+                RetrieveProductService.get_by_id(self.product.pk)
+
+
+class GenerateDatasetTests(ProductAPITestCase):
+
+    def generate(self, *args):
+        call_command('generate_dataset', '--workers', '1', *args, stdout=StringIO())
+
+    def test_runs_with_different_seeds_do_not_collide(self):
+        self.generate('--users', '3', '--products', '5', '--seed', '1')
+        self.generate('--users', '3', '--products', '5', '--seed', '2')
+
+        generated = User.objects.exclude(pk=self.user.pk)
+        self.assertEqual(generated.filter(email__endswith='@seed1.example.com').count(), 3)
+        self.assertEqual(generated.filter(email__endswith='@seed2.example.com').count(), 3)
+        self.assertEqual(Product.objects.count(), 10)
+        self.assertEqual(sum(self.get_category_counts().values()), 10)
+
+
+@override_settings(CACHES=LOCAL_CACHES, DATABASE_REPLICAS=[DEFAULT_DB_ALIAS])
+class ReplicaResponseCacheTests(APITransactionTestCase):
+    """The primary stands in for the replica; outside a test transaction its reads count as replica reads."""
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(email='user@example.com', username='user', password='password123')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        self.product = Product.objects.create(name='Product', price=Decimal('1.00'), category='books')
+        self.url = reverse('product-detail', args=[self.product.pk])
+
+    def test_replica_reads_are_cached(self):
+        self.client.get(self.url)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.data['name'], 'Product')
+
+    def test_replica_reads_expire_after_the_replica_timeout(self):
+        self.client.get(self.url)
+        # Not through the services, the cache version stays the same.
+        Product.objects.filter(pk=self.product.pk).update(name='Renamed')
+
+        with mock.patch('django.core.cache.backends.locmem.time') as clock:
+            clock.time.return_value = time.time() + settings.PRODUCT_CACHE_REPLICA_TIMEOUT + 1
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.data['name'], 'Renamed')
+
+
+class ProductAdminTests(ProductAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(
+            User.objects.create_superuser(email='admin@example.com', username='admin', password='password123')
+        )
+
+    def test_added_product_is_counted(self):
+        response = self.client.post(
+            reverse('admin:products_product_add'),
+            {'name': 'From admin', 'description': '', 'price': '5.00', 'category': 'toys'},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        self.assertEqual(Product.objects.get().name, 'From admin')
+        self.assertEqual(self.get_category_counts(), {'toys': 1})
+
+    def test_change_moves_the_facet_count(self):
+        product = self.create_product(name='Product', category='books')
+
+        self.client.post(
+            reverse('admin:products_product_change', args=[product.pk]),
+            {'name': 'Product', 'description': '', 'price': '10.00', 'category': 'toys'},
+        )
+
+        self.assertEqual(self.get_category_counts(), {'toys': 1})
+
+    def test_deletes_are_soft(self):
+        first = self.create_product(name='First')
+        second = self.create_product(name='Second')
+        third = self.create_product(name='Third')
+
+        self.client.post(reverse('admin:products_product_delete', args=[first.pk]), {'post': 'yes'})
+        self.client.post(
+            reverse('admin:products_product_changelist'),
+            {'action': 'delete_selected', '_selected_action': [second.pk], 'post': 'yes'},
+        )
+
+        self.assertEqual(list(Product.objects.values_list('pk', flat=True)), [third.pk])
+        self.assertEqual(Product.all_objects.count(), 3)
+        self.assertEqual(self.get_category_counts(), {'books': 1})
+
+    def test_deleted_product_is_listed_and_restored(self):
+        product = self.create_product(name='Deleted')
+        self.client.delete(reverse('product-detail', args=[product.pk]))
+
+        changelist = self.client.get(reverse('admin:products_product_changelist'))
+        self.client.post(
+            reverse('admin:products_product_changelist'),
+            {'action': 'restore_selected', '_selected_action': [product.pk]},
+        )
+
+        self.assertContains(changelist, 'Deleted')
+        self.assertTrue(Product.objects.filter(pk=product.pk).exists())
+        self.assertEqual(self.get_category_counts(), {'books': 1})
+
+
+@skipUnless(settings.DATABASES['default'].get('OPTIONS', {}).get('pool'), 'Needs the connection pool.')
+class PoolStatsTests(ProductAPITestCase):
+
+    def test_stats_are_read_from_the_metrics_registry(self):
+        admin = User.objects.create_superuser(email='admin@example.com', username='admin', password='password123')
+        self.authenticate(admin)
+
+        response = self.client.get(reverse('db-pool-stats'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stats = response.data['default']
+        self.assertGreaterEqual(stats['size'], 1)
+        self.assertIn('avg_checkout_wait_ms', stats)
+        exported = REGISTRY.get_sample_value('db_pool_stats', {'alias': 'default', 'stat': 'max_size'})
+        self.assertEqual(stats['max_size'], exported)
@@ -1,6 +1,9 @@
+from django.conf import settings
 from rest_framework import routers
-from apps.products.views import ProductViewSet
+from apps.products.views import AsyncProductViewSet, ProductViewSet
 
 # Create a router and register the ProductViewSet
 product_router = routers.SimpleRouter()
-product_router.register(r'products', ProductViewSet, basename='product')
+product_router.register(
+    r'products', AsyncProductViewSet if settings.ASYNC_VIEWS else ProductViewSet, basename='product'
+)
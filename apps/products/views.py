@@ -1,36 +1,77 @@
-from django.contrib.postgres.search import SearchVector
+import hashlib
+from functools import cache
+
+from adrf.viewsets import GenericViewSet as AsyncGenericViewSet
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 from django_filters.rest_framework import DjangoFilterBackend
-from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
+from drf_yasg.utils import no_body, swagger_auto_schema
 from rest_framework import status
 from rest_framework import viewsets
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.response import Response
+from rest_framework_simplejwt.authentication import JWTAuthentication
 
-from Product.settings import ProductPagination
+from services.base.serializers import fields_parameter, get_requested_fields
+from services.base.versioning import IF_MATCH_PARAMETER, get_expected_version, version_etag
+from services.db.routers import served_by_replica
+from services.throttling.throttles import UserWriteRateThrottle
 from apps.products.services.products import (
     CreateProductService,
     UpdateProductService,
     DeleteProductService,
     ListProductService,
     ProductService, RetrieveProductService,
+    ExportProductService,
 )
+from apps.products.services.cache import product_cache
+from apps.products.services.facets import ProductFacetService
+from apps.users.authentication import ClaimsJWTAuthentication
 from .filters import ProductFilter
-from .models import Product
-from .serializers import ProductSerializer
+from .models import Category, Product
+from .pagination import ProductKeysetPagination, ProductPagination
+from .serializers import (
+    ProductSerializer,
+    ProductBulkUpdateSerializer,
+    ProductBulkDeleteSerializer,
+    ProductValuesSerializer,
+)
 
 
+@cache
 def create_product_service() -> ProductService:
+    """The services keep no per-request state, so one graph is shared by all requests."""
     create_service = CreateProductService()
     update_service = UpdateProductService()
     delete_service = DeleteProductService()
     list_service = ListProductService()
     retrieve_service = RetrieveProductService()
-    return ProductService(create_service, update_service, delete_service, list_service, retrieve_service)
+    export_service = ExportProductService()
+    facet_service = ProductFacetService()
+    return ProductService(
+        create_service, update_service, delete_service, list_service, retrieve_service, export_service,
+        facet_service,
+    )
+
+
+# Query parameters that do not change which products a facet counts.
+FACET_NEUTRAL_PARAMS = {'limit', 'offset', 'ordering', 'pagination', 'cursor', 'fields'}
+FIELDS_PARAMETER = fields_parameter(ProductSerializer.Meta.fields)
+# Actions limited by the per-user write throttle.
+WRITE_ACTIONS = {'create', 'update', 'destroy', 'restore', 'bulk_create', 'bulk_update', 'bulk_delete'}
+# Actions that may authenticate from the token claims alone, see AUTH_CLAIMS_ONLY_READS.
+READ_ACTIONS = {'list', 'retrieve', 'facets', 'export'}
 
 
 class ProductViewSet(viewsets.GenericViewSet):
     swagger_tags = ["Products"]
-    queryset = Product.objects.all()
+    queryset = Product.objects.order_by('-created_at', '-id')
     serializer_class = ProductSerializer
     filter_backends = (DjangoFilterBackend,)
     filterset_class = ProductFilter
@@ -40,49 +81,121 @@ class ProductViewSet(viewsets.GenericViewSet):
         super().__init__(**kwargs)
         self.product_service = create_product_service()
 
-    def get_queryset(self):
-        queryset = super().get_queryset()
+    def get_authenticators(self):
+        authenticators = super().get_authenticators()
+        if not settings.AUTH_CLAIMS_ONLY_READS:
+            return authenticators
+        # Runs before `self.action` is set, so the action is looked up here.
+        request = getattr(self, 'request', None)
+        action_map = getattr(self, 'action_map', None) or {}
+        if request is None or action_map.get(request.method.lower()) not in READ_ACTIONS:
+            return authenticators
+        return [ClaimsJWTAuthentication() if isinstance(a, JWTAuthentication) else a for a in authenticators]
+
+    def get_throttles(self):
+        if self.action in WRITE_ACTIONS:
+            return [UserWriteRateThrottle()]
+        return super().get_throttles()
+
+    @property
+    def paginator(self):
+        """Use keyset pagination when the client asks for it, offset otherwise."""
+        if not hasattr(self, '_paginator'):
+            request = getattr(self, 'request', None)
+            if self.pagination_class is None:
+                self._paginator = None
+            elif request is not None and ProductKeysetPagination.is_requested(request):
+                self._paginator = ProductKeysetPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def filter_queryset(self, queryset):
+        if ProductKeysetPagination.is_requested(self.request):
+            self.check_keyset_ordering()
+        queryset = super().filter_queryset(queryset)
 
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.annotate(
-                search=SearchVector('name', 'description')
-            ).filter(search=search)
+            # Results are ordered by rank, which neither `ordering` nor a keyset cursor can express.
+            if 'ordering' in self.request.query_params or ProductKeysetPagination.is_requested(self.request):
+                raise ValidationError({
+                    'search': 'Search results are ordered by rank and cannot be combined with '
+                              '`ordering` or cursor pagination.'
+                })
+            queryset = self.product_service.search_products(queryset, search)
 
         return queryset
 
+    def check_keyset_ordering(self):
+        """Rejects orders that keyset pages, sorted by one indexed field, would silently replace."""
+        params = self.request.query_params
+        if params.get('name_fuzzy'):
+            raise ValidationError({
+                'name_fuzzy': 'Fuzzy matches are ordered by similarity and cannot be combined with cursor pagination.'
+            })
+        ordering = params.get('ordering')
+        if ordering and ordering not in ProductKeysetPagination.orderings:
+            raise ValidationError({
+                'ordering': f"Cursor pagination orders by one of: {', '.join(ProductKeysetPagination.orderings)}."
+            })
+
     @swagger_auto_schema(
         operation_description='Creates a new product with provided data.',
         request_body=ProductSerializer,
+        manual_parameters=[FIELDS_PARAMETER],
         responses={201: ProductSerializer(many=False)}
     )
     def create(self, request, *args, **kwargs):
+        fields = get_requested_fields(request, ProductSerializer.Meta.fields)
         serializer = self.serializer_class(data=request.data)
         serializer.is_valid(raise_exception=True)
         product = self.product_service.create_service.create(**serializer.validated_data)
-        return Response(self.serializer_class(product).data, status=status.HTTP_201_CREATED)
+        return Response(self.serializer_class(product, fields=fields).data, status=status.HTTP_201_CREATED)
 
     @swagger_auto_schema(
         operation_description='Updates product information with provided data.',
         request_body=ProductSerializer,
-        responses={200: ProductSerializer(many=False)}
+        manual_parameters=[FIELDS_PARAMETER, IF_MATCH_PARAMETER],
+        responses={200: ProductSerializer(many=False), 409: 'The product was modified by another request.'}
     )
     def update(self, request, pk=None, *args, **kwargs):
+        fields = get_requested_fields(request, ProductSerializer.Meta.fields)
+        expected_version = get_expected_version(request, pk)
         product = self.product_service.update_service.get_by_id(pk)
         serializer = self.serializer_class(product, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
-        updated_product = self.product_service.update_service.update(pk, **serializer.validated_data)
-        return Response(self.serializer_class(updated_product).data, status=status.HTTP_200_OK)
+        updated_product = self.product_service.update_service.update(
+            pk, expected_version, **serializer.validated_data
+        )
+        response = Response(self.serializer_class(updated_product, fields=fields).data, status=status.HTTP_200_OK)
+        last_modified = updated_product.updated_at
+        return self.with_validators(response, self.get_retrieve_etag(pk, fields, last_modified), last_modified)
 
     @swagger_auto_schema(
         operation_description='Retrieves a list of all products.',
+        manual_parameters=[FIELDS_PARAMETER],
         responses={200: ProductSerializer(many=True)}
     )
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        page = self.paginate_queryset(queryset)
-        serializer = self.serializer_class(page, many=True)
-        return self.get_paginated_response(serializer.data)
+        # Parsed first so unknown fields are rejected before any cache lookup.
+        fields = get_requested_fields(request, ProductValuesSerializer.fields)
+        cache_key, cached = self.get_cached('list', request)
+        if cached is None:
+            queryset = self.filter_queryset(self.get_queryset())
+            last_modified, count = None, None
+            if self.counts_exactly:
+                last_modified, count = self.product_service.list_service.get_version(queryset)
+            etag = self.get_list_etag(request, count, last_modified)
+            not_modified = self.get_not_modified_response(request, etag, last_modified)
+            if not_modified is not None:
+                return not_modified
+            # Only the requested columns are selected.
+            page = self.paginate_queryset(queryset.values(*ProductValuesSerializer.get_columns(fields)))
+            data = self.get_paginated_response(ProductValuesSerializer.many(page, fields)).data
+            cached = (data, etag, last_modified)
+            self.set_cached(cache_key, cached)
+        return self.get_cached_response(request, cached)
 
     @swagger_auto_schema(
         operation_description='Deletes a product by its ID. Only authenticated users can delete.',
@@ -92,12 +205,252 @@ class ProductViewSet(viewsets.GenericViewSet):
         self.product_service.delete_service.delete(pk)
         return Response({"message": "Product deleted successfully."}, status=status.HTTP_204_NO_CONTENT)
 
+    @swagger_auto_schema(
+        operation_description='Restores a deleted product that has not been purged yet. Admins only.',
+        request_body=no_body,
+        responses={200: ProductSerializer(many=False)}
+    )
+    @action(detail=True, methods=['post'], url_path='restore', permission_classes=[IsAdminUser])
+    def restore(self, request, pk=None):
+        product = self.product_service.delete_service.restore(pk)
+        return Response(self.serializer_class(product).data, status=status.HTTP_200_OK)
+
     @swagger_auto_schema(
         operation_description='Retrieves a product by its ID.',
+        manual_parameters=[FIELDS_PARAMETER],
         responses={200: ProductSerializer(many=False)}
     )
     def retrieve(self, request, pk=None, *args, **kwargs):
-        product = self.product_service.retrieve_service.get_by_id(pk)
-        serializer = self.serializer_class(product)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        fields = get_requested_fields(request, ProductValuesSerializer.fields)
+        cache_key, cached = self.get_cached('retrieve', request, pk)
+        if cached is None:
+            last_modified = self.product_service.retrieve_service.get_last_modified(pk)
+            etag = self.get_retrieve_etag(pk, fields, last_modified)
+            not_modified = self.get_not_modified_response(request, etag, last_modified)
+            if not_modified is not None:
+                return not_modified
+            row = self.product_service.retrieve_service.get_values_by_id(
+                pk, ProductValuesSerializer.get_columns(fields)
+            )
+            cached = (ProductValuesSerializer.to_representation(row, fields), etag, last_modified)
+            self.set_cached(cache_key, cached)
+        return self.get_cached_response(request, cached)
+
+    @property
+    def counts_exactly(self) -> bool:
+        return isinstance(self.paginator, ProductPagination) and self.paginator.count_strategy.exact
+
+    @staticmethod
+    def get_cached(action: str, request, *parts) -> tuple:
+        """Returns the response cache key of a request and its cached entry, ``None`` on a miss."""
+        cache_key = product_cache.request_key(action, request, *parts)
+        return cache_key, product_cache.get(cache_key)
+
+    @staticmethod
+    def set_cached(cache_key: str, cached: tuple) -> None:
+        # A lagging replica may not have the write that bumped the cache version
+        # yet, so its rows are only kept for about the replication lag.
+        timeout = settings.PRODUCT_CACHE_REPLICA_TIMEOUT if served_by_replica() else None
+        product_cache.set(cache_key, cached, timeout=timeout)
+
+    def get_cached_response(self, request, cached: tuple):
+        data, etag, last_modified = cached
+        return self.get_not_modified_response(request, etag, last_modified) or self.with_validators(
+            Response(data, status=status.HTTP_200_OK), etag, last_modified
+        )
+
+    def get_list_etag(self, request, count, last_modified) -> str:
+        # The exact count doubles as the page count. Without one, the cache
+        # version (bumped by every write) is the only validator: the
+        # MAX(updated_at) next to it would scan the whole filtered set.
+        if self.counts_exactly:
+            self.paginator.known_count = count
+        else:
+            count = f'v{product_cache.version()}'
+        params = sorted(request.query_params.lists())
+        return hashlib.sha1(f'{params}:{count}:{last_modified}'.encode()).hexdigest()
+
+    @staticmethod
+    def get_retrieve_etag(pk, fields, last_modified):
+        if last_modified is None:
+            return None
+        etag = version_etag(pk, last_modified)
+        if fields:
+            etag += '-' + hashlib.sha1(','.join(fields).encode()).hexdigest()[:12]
+        return etag
+
+    @staticmethod
+    def get_not_modified_response(request, etag, last_modified):
+        """Returns a 304 response if the client's If-None-Match/If-Modified-Since still match."""
+        if etag is None:
+            return None
+        response = get_conditional_response(
+            request,
+            etag=quote_etag(etag),
+            last_modified=int(last_modified.timestamp()) if last_modified else None,
+        )
+        if response is not None:
+            response['ETag'] = quote_etag(etag)
+        return response
+
+    @staticmethod
+    def with_validators(response, etag, last_modified):
+        if etag is not None:
+            response['ETag'] = quote_etag(etag)
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        return response
+
+    @swagger_auto_schema(
+        operation_description='Creates many products in one transaction. Nothing is written if any item is invalid.',
+        request_body=ProductSerializer(many=True),
+        responses={201: ProductSerializer(many=True)}
+    )
+    @action(detail=False, methods=['post'], url_path='bulk_create')
+    def bulk_create(self, request):
+        serializer = ProductSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        products = self.product_service.create_service.bulk_create(serializer.validated_data)
+        return Response(ProductSerializer(products, many=True).data, status=status.HTTP_201_CREATED)
+
+    @swagger_auto_schema(
+        operation_description='Partially updates many products in one transaction. Every item needs an id.',
+        request_body=ProductBulkUpdateSerializer(many=True),
+        responses={
+            200: ProductBulkUpdateSerializer(many=True),
+            400: 'One error object per item, in input order; unknown or deleted ids get an `id` error.',
+        }
+    )
+    @action(detail=False, methods=['patch'], url_path='bulk_update')
+    def bulk_update(self, request):
+        serializer = ProductBulkUpdateSerializer(data=request.data, many=True, partial=True)
+        serializer.is_valid(raise_exception=True)
+        products = self.product_service.update_service.bulk_update(serializer.validated_data)
+        return Response(ProductBulkUpdateSerializer(products, many=True).data, status=status.HTTP_200_OK)
 
+    @swagger_auto_schema(
+        operation_description='Deletes many products by their IDs in one transaction.',
+        request_body=ProductBulkDeleteSerializer,
+        responses={200: 'Number of deleted products.'}
+    )
+    @action(detail=False, methods=['post'], url_path='bulk_delete')
+    def bulk_delete(self, request):
+        serializer = ProductBulkDeleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        deleted = self.product_service.delete_service.bulk_delete(serializer.validated_data['ids'])
+        return Response({"deleted": deleted}, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        operation_description='Streams all filtered products as NDJSON (default) or CSV.',
+        manual_parameters=[
+            openapi.Parameter('file_format', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=['ndjson', 'csv']),
+        ],
+        responses={200: 'Streamed NDJSON or CSV file.'}
+    )
+    @action(detail=False, methods=['get'], url_path='export', pagination_class=None)
+    def export(self, request):
+        return self.get_export_response(request)
+
+    def get_export_response(self, request, asynchronous: bool = False):
+        queryset = self.filter_queryset(self.get_queryset())
+        export_service = self.product_service.export_service
+        if request.query_params.get('file_format') == 'csv':
+            rows = export_service.aiter_csv(queryset) if asynchronous else export_service.iter_csv(queryset)
+            response = StreamingHttpResponse(rows, content_type='text/csv')
+            filename = 'products.csv'
+        else:
+            rows = export_service.aiter_ndjson(queryset) if asynchronous else export_service.iter_ndjson(queryset)
+            response = StreamingHttpResponse(rows, content_type='application/x-ndjson')
+            filename = 'products.ndjson'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    @swagger_auto_schema(
+        operation_description='Returns the product response cache version and hit/miss counters.',
+        responses={200: 'Cache statistics.'}
+    )
+    @action(detail=False, methods=['get'], url_path='cache_stats', permission_classes=[IsAdminUser])
+    def cache_stats(self, request):
+        return Response(product_cache.stats(), status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        operation_description='Returns per-category counts and a price histogram for the current filter.',
+        responses={200: 'Category counts and price buckets.'}
+    )
+    @action(detail=False, methods=['get'], url_path='facets', pagination_class=None)
+    def facets(self, request):
+        facet_service = self.product_service.facet_service
+        params = {name for name, value in request.query_params.items() if value} - FACET_NEUTRAL_PARAMS
+        category = request.query_params.get('category')
+        if params <= {'category'} and (not category or category in Category.values):
+            data = facet_service.get_facets(category)
+        else:
+            data = facet_service.get_facets_for(self.filter_queryset(self.get_queryset()))
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class AsyncProductViewSet(ProductViewSet, AsyncGenericViewSet):
+    """ProductViewSet with async list and retrieve for the ASGI server.
+
+    Reads go through Django's async ORM, so a slow query suspends the request
+    instead of holding a worker. The remaining actions are sync and are run in
+    a thread by adrf. Used when ``ASYNC_VIEWS`` is enabled.
+    """
+
+    async def apaginate_queryset(self, queryset):
+        return await self.paginator.apaginate_queryset(queryset, self.request, view=self)
+
+    @swagger_auto_schema(
+        operation_description='Retrieves a list of all products.',
+        manual_parameters=[FIELDS_PARAMETER],
+        responses={200: ProductSerializer(many=True)}
+    )
+    async def list(self, request, *args, **kwargs):
+        fields = get_requested_fields(request, ProductValuesSerializer.fields)
+        cache_key, cached = await sync_to_async(self.get_cached)('list', request)
+        if cached is None:
+            queryset = self.filter_queryset(self.get_queryset())
+            last_modified, count = None, None
+            if self.counts_exactly:
+                last_modified, count = await self.product_service.list_service.aget_version(queryset)
+            etag = await sync_to_async(self.get_list_etag)(request, count, last_modified)
+            not_modified = self.get_not_modified_response(request, etag, last_modified)
+            if not_modified is not None:
+                return not_modified
+            page = await self.apaginate_queryset(queryset.values(*ProductValuesSerializer.get_columns(fields)))
+            data = self.get_paginated_response(ProductValuesSerializer.many(page, fields)).data
+            cached = (data, etag, last_modified)
+            await sync_to_async(self.set_cached)(cache_key, cached)
+        return self.get_cached_response(request, cached)
+
+    @swagger_auto_schema(
+        operation_description='Retrieves a product by its ID.',
+        manual_parameters=[FIELDS_PARAMETER],
+        responses={200: ProductSerializer(many=False)}
+    )
+    async def retrieve(self, request, pk=None, *args, **kwargs):
+        fields = get_requested_fields(request, ProductValuesSerializer.fields)
+        retrieve_service = self.product_service.retrieve_service
+        cache_key, cached = await sync_to_async(self.get_cached)('retrieve', request, pk)
+        if cached is None:
+            last_modified = await retrieve_service.aget_last_modified(pk)
+            etag = self.get_retrieve_etag(pk, fields, last_modified)
+            not_modified = self.get_not_modified_response(request, etag, last_modified)
+            if not_modified is not None:
+                return not_modified
+            row = await retrieve_service.aget_values_by_id(pk, ProductValuesSerializer.get_columns(fields))
+            cached = (ProductValuesSerializer.to_representation(row, fields), etag, last_modified)
+            await sync_to_async(self.set_cached)(cache_key, cached)
+        return self.get_cached_response(request, cached)
+
+    @swagger_auto_schema(
+        operation_description='Streams all filtered products as NDJSON (default) or CSV.',
+        manual_parameters=[
+            openapi.Parameter('file_format', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=['ndjson', 'csv']),
+        ],
+        responses={200: 'Streamed NDJSON or CSV file.'}
+    )
+    @action(detail=False, methods=['get'], url_path='export', pagination_class=None)
+    async def export(self, request):
+        # An async iterator, a sync one would be buffered whole by Django under ASGI.
+        return self.get_export_response(request, asynchronous=True)
@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+def user_cache_key(user_id) -> str:
+    return f'auth:user:{user_id}'
+
+
+def invalidate_cached_user(user_id) -> None:
+    cache.delete(user_cache_key(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that keeps resolved users in the cache for ``AUTH_USER_CACHE_TIMEOUT`` seconds.
+
+    Saves the ``SELECT`` on the users table for every authenticated request.
+    Only the fields that authentication and permissions need are cached, never
+    the password hash or the groups; the user is rebuilt from them with the
+    other fields deferred, so reading one of those loads it from the database.
+    Entries are dropped when the user is saved or deleted (see
+    ``apps.users.signals``) and by UserUpdateService. The active and password
+    checks still run on every request against the cached fields.
+    """
+    cached_fields = ('id', 'username', 'email', 'is_active', 'is_staff', 'is_superuser')
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        key = user_cache_key(user_id)
+        values = cache.get(key)
+        if values is None:
+            user = super().get_user(validated_token)
+            values = {field: getattr(user, field) for field in self.cached_fields}
+            if api_settings.CHECK_REVOKE_TOKEN:
+                values['password_hash'] = get_md5_hash_password(user.password)
+            cache.set(key, values, timeout=settings.AUTH_USER_CACHE_TIMEOUT)
+            return user
+
+        # The same checks as JWTAuthentication.get_user, without the query.
+        if api_settings.CHECK_USER_IS_ACTIVE and not values['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != values.get('password_hash'):
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return self.user_model.from_db(
+            DEFAULT_DB_ALIAS, list(self.cached_fields), [values[field] for field in self.cached_fields]
+        )
+
+
+class ClaimsJWTAuthentication(JWTStatelessUserAuthentication):
+    """Builds a lightweight TokenUser from the token claims, without any lookup.
+
+    Deactivated users keep access until their token expires, so this is only
+    used for read-only endpoints, when ``AUTH_CLAIMS_ONLY_READS`` is enabled.
+    """
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from apps.users.models import User
+from services.base.serializers import DynamicFieldsModelSerializer
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -18,7 +19,7 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         return data
 
 
-class UserDetailSerializer(serializers.ModelSerializer):
+class UserDetailSerializer(DynamicFieldsModelSerializer):
     """Serializer for retrieving user details."""
     class Meta:
         model = User
@@ -1,5 +1,9 @@
+from functools import partial
+
+from django.db import transaction
 from rest_framework.exceptions import ValidationError
 from rest_framework.generics import get_object_or_404
+from apps.users.authentication import invalidate_cached_user
 from apps.users.models import User
 from services.base.services import BaseService
 from .jwt import AuthService
@@ -43,6 +47,13 @@ class UserCreatService(BaseService):
 class UserUpdateService(BaseService):
     model = User
 
+    @classmethod
+    def update(cls, object_id: int, expected_version=None, **kwargs) -> User:
+        user = super().update(object_id, expected_version, **kwargs)
+        # A single UPDATE sends no post_save, so the cached user is dropped here.
+        transaction.on_commit(partial(invalidate_cached_user, user.pk))
+        return user
+
 
 class UserLoginService(BaseService):
     """
@@ -115,5 +126,8 @@ class UserService:
     def sign_in(self, email: str) -> dict:
         return self.user_login_service.execute(email)
 
-    def update_user(self, user_id: int, **kwargs) -> User:
-        return self.user_update_service.update(user_id, **kwargs)
+    def update_user(self, user_id: int, expected_version=None, **kwargs) -> User:
+        return self.user_update_service.update(user_id, expected_version, **kwargs)
+
+    async def aupdate_user(self, user_id: int, expected_version=None, **kwargs) -> User:
+        return await self.user_update_service.aupdate(user_id, expected_version, **kwargs)
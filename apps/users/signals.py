@@ -0,0 +1,16 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.users.authentication import invalidate_cached_user
+from apps.users.models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_cached_user(sender, instance, **kwargs):
+    """Covers saves from the admin and anywhere else ``save()`` or ``delete()`` is called."""
+    # After the commit, so a concurrent request cannot cache the old row again.
+    transaction.on_commit(partial(invalidate_cached_user, instance.pk))
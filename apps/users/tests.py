@@ -1,3 +1,125 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.users.authentication import CachedJWTAuthentication, user_cache_key
+from apps.users.models import User
+from services.throttling.throttles import SlidingWindowRateThrottle
+
+# The tests do not need the Redis server of the default settings.
+LOCAL_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class CachedAuthenticationTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='user@example.com', username='user', password='password123', first_name='Old'
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        self.url = reverse('user-user')
+
+    def count_user_queries(self, request) -> tuple:
+        with CaptureQueriesContext(connection) as queries:
+            response = request()
+        return response, sum('users_user' in query['sql'] for query in queries.captured_queries)
+
+    def test_cached_user_is_not_loaded_again(self):
+        self.client.get(reverse('product-list'))
+
+        response, user_queries = self.count_user_queries(lambda: self.client.get(reverse('product-list')))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(user_queries, 0)
+
+    def test_cache_holds_no_password_hash(self):
+        self.client.get(reverse('product-list'))
+
+        cached = cache.get(user_cache_key(self.user.pk))
+
+        self.assertEqual(set(cached), set(CachedJWTAuthentication.cached_fields))
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get(reverse('product-list'))
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+
+        response = self.client.get(reverse('product-list'))
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_profile_is_read_in_full_from_a_cached_user(self):
+        self.client.get(reverse('product-list'))
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['first_name'], 'Old')
+
+    def test_profile_update_drops_the_cached_user(self):
+        self.client.get(self.url)
+        data = {'email': 'user@example.com', 'username': 'renamed', 'first_name': 'New'}
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+        response = self.client.get(self.url)
+        self.assertEqual((response.data['username'], response.data['first_name']), ('renamed', 'New'))
+
+    def test_stale_profile_update_is_rejected(self):
+        etag = self.client.get(self.url).headers['ETag']
+        data = {'email': 'user@example.com', 'username': 'user', 'first_name': 'First'}
+        self.client.patch(self.url, data, format='json', HTTP_IF_MATCH=etag)
+
+        response = self.client.patch(self.url, {**data, 'first_name': 'Second'}, format='json', HTTP_IF_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+@mock.patch.object(SlidingWindowRateThrottle, 'THROTTLE_RATES', {'auth_ip': '100/min', 'auth_email': '2/min'})
+class AuthThrottleTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(email='user@example.com', username='user', password='password123')
+        self.url = reverse('user-sign-in')
+
+    def sign_in(self, email: str, password: str = 'wrong-password'):
+        return self.client.post(self.url, {'email': email, 'password': password}, format='json')
+
+    def test_attempts_over_the_limit_are_rejected(self):
+        self.sign_in('user@example.com')
+        self.sign_in('user@example.com')
+
+        response = self.sign_in('user@example.com', 'password123')
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response.headers)
+
+    def test_limit_is_per_email_regardless_of_case(self):
+        self.sign_in('user@example.com')
+        self.sign_in('USER@example.com')
+
+        self.assertEqual(self.sign_in('User@Example.com').status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertNotEqual(self.sign_in('other@example.com').status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_limit_per_address(self):
+        with mock.patch.object(SlidingWindowRateThrottle, 'THROTTLE_RATES', {'auth_ip': '2/min', 'auth_email': None}):
+            self.sign_in('first@example.com')
+            self.sign_in('second@example.com')
+
+            response = self.sign_in('third@example.com')
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
@@ -1,7 +1,8 @@
+from django.conf import settings
 from rest_framework import routers
 from apps.products.views import ProductViewSet
-from apps.users.views import UserViewSet
+from apps.users.views import AsyncUserViewSet, UserViewSet
 
 # Create a router and register the ProductViewSet
 user_router = routers.SimpleRouter()
-user_router.register(r'users', UserViewSet, basename='user')
+user_router.register(r'users', AsyncUserViewSet if settings.ASYNC_VIEWS else UserViewSet, basename='user')
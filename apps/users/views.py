@@ -1,3 +1,8 @@
+from functools import cache
+
+from adrf.viewsets import GenericViewSet as AsyncGenericViewSet
+from asgiref.sync import sync_to_async
+from django.utils.http import quote_etag
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated
@@ -12,6 +17,9 @@ from apps.users.serializers import (
     UserLoginResponseSerializer,
 )
 from apps.users.services.jwt import AuthService
+from services.base.serializers import fields_parameter, get_requested_fields
+from services.base.versioning import IF_MATCH_PARAMETER, get_expected_version, version_etag
+from services.throttling.throttles import AuthEmailRateThrottle, AuthIPRateThrottle
 from apps.users.services.users import (
     UserService,
     UserCreatService,
@@ -20,7 +28,9 @@ from apps.users.services.users import (
 )
 
 
+@cache
 def create_user_service() -> UserService:
+    """The services keep no per-request state, so one graph is shared by all requests."""
     auth_service = AuthService()
     user_create_service = UserCreatService()
     user_login_service = UserLoginService(auth_service)
@@ -48,9 +58,12 @@ class UserViewSet(viewsets.GenericViewSet):
     @swagger_auto_schema(
         operation_description="Creates a new user with the provided data.",
         request_body=UserRegistrationSerializer,
-        responses={201: UserDetailSerializer()}
+        responses={201: UserDetailSerializer(), 429: 'Too many attempts from this address or for this email.'}
+    )
+    @action(
+        detail=False, methods=['post'], permission_classes=[AllowAny], url_path='sign_up',
+        throttle_classes=[AuthIPRateThrottle, AuthEmailRateThrottle],
     )
-    @action(detail=False, methods=['post'], permission_classes=[AllowAny], url_path='sign_up')
     def sign_up(self, request):
         serializer = UserRegistrationSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -67,9 +80,12 @@ class UserViewSet(viewsets.GenericViewSet):
     @swagger_auto_schema(
         operation_description="User login.",
         request_body=UserLoginSerializer,
-        responses={200: UserLoginResponseSerializer()}
+        responses={200: UserLoginResponseSerializer(), 429: 'Too many attempts from this address or for this email.'}
+    )
+    @action(
+        detail=False, methods=['post'], permission_classes=[AllowAny], url_path='sign_in',
+        throttle_classes=[AuthIPRateThrottle, AuthEmailRateThrottle],
     )
-    @action(detail=False, methods=['post'], permission_classes=[AllowAny], url_path='sign_in')
     def sign_in(self, request):
         serializer = UserLoginSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -84,20 +100,78 @@ class UserViewSet(viewsets.GenericViewSet):
     @swagger_auto_schema(
         method='get',
         operation_description="Retrieves information about the user.",
+        manual_parameters=[fields_parameter(UserDetailSerializer.Meta.fields)],
         responses={200: UserDetailSerializer()}
     )
     @swagger_auto_schema(
         method='patch',
         operation_description="Updates user information with the provided data.",
         request_body=UserDetailSerializer(),
-        responses={200: UserDetailSerializer()}
+        manual_parameters=[fields_parameter(UserDetailSerializer.Meta.fields), IF_MATCH_PARAMETER],
+        responses={200: UserDetailSerializer(), 409: 'The user was modified by another request.'}
     )
     @action(detail=False, methods=['get', 'patch'], permission_classes=[IsAuthenticated], url_path='')
     def user(self, request):
-        user = request.user
+        fields = get_requested_fields(request, UserDetailSerializer.Meta.fields)
+        user = self.get_user(request)
         if request.method == 'PATCH':
             serializer = UserDetailSerializer(data=request.data, instance=user)
             serializer.is_valid(raise_exception=True)
-            user = self.user_service.update_user(user.id, **serializer.validated_data)
-        serializer = UserDetailSerializer(user)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+            expected_version = get_expected_version(request, user.id)
+            user = self.user_service.update_user(user.id, expected_version, **serializer.validated_data)
+        serializer = UserDetailSerializer(user, fields=fields)
+        return self.with_etag(Response(serializer.data, status=status.HTTP_200_OK), user)
+
+    def get_user(self, request):
+        """The whole row of the requesting user, for the serializer and the update.
+
+        A user from the authentication cache only carries a few fields, so it
+        is loaded once; one that authentication just read is reused as is.
+        """
+        user_update_service = self.user_service.user_update_service
+        if request.user.get_deferred_fields():
+            return user_update_service.get_by_id(request.user.pk)
+        return user_update_service.remember(request.user)
+
+    async def aget_user(self, request):
+        """Async counterpart of ``get_user``."""
+        user_update_service = self.user_service.user_update_service
+        if request.user.get_deferred_fields():
+            return await user_update_service.aget_by_id(request.user.pk)
+        return user_update_service.remember(request.user)
+
+    @staticmethod
+    def with_etag(response, user):
+        """The ETag is what a later PATCH sends back in ``If-Match``."""
+        response['ETag'] = quote_etag(version_etag(user.pk, user.updated_at))
+        return response
+
+
+class AsyncUserViewSet(UserViewSet, AsyncGenericViewSet):
+    """UserViewSet with an async ``user`` action for the ASGI server, used when ``ASYNC_VIEWS`` is enabled."""
+
+    @swagger_auto_schema(
+        method='get',
+        operation_description="Retrieves information about the user.",
+        manual_parameters=[fields_parameter(UserDetailSerializer.Meta.fields)],
+        responses={200: UserDetailSerializer()}
+    )
+    @swagger_auto_schema(
+        method='patch',
+        operation_description="Updates user information with the provided data.",
+        request_body=UserDetailSerializer(),
+        manual_parameters=[fields_parameter(UserDetailSerializer.Meta.fields), IF_MATCH_PARAMETER],
+        responses={200: UserDetailSerializer(), 409: 'The user was modified by another request.'}
+    )
+    @action(detail=False, methods=['get', 'patch'], permission_classes=[IsAuthenticated], url_path='')
+    async def user(self, request):
+        fields = get_requested_fields(request, UserDetailSerializer.Meta.fields)
+        user = await self.aget_user(request)
+        if request.method == 'PATCH':
+            serializer = UserDetailSerializer(data=request.data, instance=user)
+            # Unique validators query the database.
+            await sync_to_async(serializer.is_valid)(raise_exception=True)
+            expected_version = get_expected_version(request, user.id)
+            user = await self.user_service.aupdate_user(user.id, expected_version, **serializer.validated_data)
+        serializer = UserDetailSerializer(user, fields=fields)
+        return self.with_etag(Response(serializer.data, status=status.HTTP_200_OK), user)
@@ -0,0 +1,338 @@
+"""Drives a weighted mix of API requests against a running server and reports latency per endpoint.
+
+Usage:
+    python benchmarks/load_test.py [--base-url http://localhost:8000] [--duration 30] [--concurrency 16]
+                                   [--seed 1] [--output results.json] [--compare previous.json]
+
+Start the server first, the way it is deployed (gunicorn or uvicorn, see
+entrypoint.sh); ``runserver`` measures the development server instead. A
+benchmark user is signed up on first use. Retrieve and bulk update only touch
+products created by the run, and all of them are deleted at the end.
+
+Every request comes from one address and signs in as one user, so raise the
+rate limits of the server under test (``THROTTLE_AUTH_IP_RATE``,
+``THROTTLE_AUTH_EMAIL_RATE``, ``THROTTLE_WRITE_RATE``) unless the throttles
+themselves are being measured; 429 responses are reported as errors.
+
+Results are written as JSON (by default to ``benchmarks/results/``) together
+with the commit they were measured on, so runs can be compared with
+``--compare``.
+"""
+import argparse
+import http.client
+import json
+import math
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+
+ROOT = Path(__file__).resolve().parent.parent
+CATEGORIES = ('electronics', 'fashion', 'books', 'food', 'toys')
+SEARCH_TERMS = ('phone', 'book', 'cotton', 'toy', 'organic', 'wireless', 'classic', 'set')
+
+# Share of requests per endpoint.
+MIX = {
+    'list': 30,
+    'filter': 20,
+    'search': 15,
+    'retrieve': 20,
+    'sign_in': 5,
+    'bulk_create': 5,
+    'bulk_update': 5,
+}
+
+
+class Client:
+    """Keep-alive HTTP client of one benchmark thread."""
+
+    def __init__(self, base_url: str, token: str = None):
+        url = urlsplit(base_url)
+        self.host, self.port = url.hostname, url.port or 80
+        self.token = token
+        self.connection = None
+
+    def request(self, method: str, path: str, body=None) -> tuple:
+        """Sends a request and returns ``(status, seconds, body)``, status 0 on a connection error."""
+        headers = {'Accept': 'application/json'}
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        started = time.perf_counter()
+        try:
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            self.connection.request(method, path, body=payload, headers=headers)
+            response = self.connection.getresponse()
+            content = response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            self.close()
+            return 0, time.perf_counter() - started, b''
+        return status, time.perf_counter() - started, content
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class Run:
+    """Shared state of a benchmark run."""
+
+    def __init__(self, args):
+        self.args = args
+        self.run_id = f'{args.seed}-{int(time.time())}'
+        self.email = args.email
+        self.password = args.password
+        self.product_ids = []
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.created = 0
+
+    def product(self, rng: random.Random) -> dict:
+        with self.lock:
+            self.created += 1
+            number = self.created
+        words = ' '.join(rng.choice(SEARCH_TERMS) for _ in range(rng.randint(3, 12)))
+        return {
+            'name': f'bench-{self.run_id}-{number}',
+            'description': words,
+            'price': f'{rng.lognormvariate(3.5, 1.0) + 0.01:.2f}',
+            'category': rng.choice(CATEGORIES),
+        }
+
+    def record(self, endpoint: str, status: int, seconds: float):
+        with self.lock:
+            self.latencies[endpoint].append(seconds)
+            self.statuses[endpoint][status] += 1
+
+
+def scenario(run: Run, rng: random.Random, endpoint: str) -> tuple:
+    """Returns ``(method, path, body)`` of one request to ``endpoint``."""
+    if endpoint == 'list':
+        return 'GET', '/api/products/?' + urlencode({'limit': 20, 'offset': rng.randrange(0, 200, 20)}), None
+    if endpoint == 'filter':
+        low = round(rng.lognormvariate(3.0, 1.0), 2)
+        params = {
+            'category': rng.choice(CATEGORIES),
+            'price_min': low,
+            'price_max': round(low * rng.uniform(1.5, 10), 2),
+            'ordering': rng.choice(['price', '-price', '-created_at']),
+            'limit': 20,
+        }
+        return 'GET', '/api/products/?' + urlencode(params), None
+    if endpoint == 'search':
+        return 'GET', '/api/products/?' + urlencode({'search': rng.choice(SEARCH_TERMS), 'limit': 20}), None
+    if endpoint == 'retrieve':
+        return 'GET', f'/api/products/{rng.choice(run.product_ids)}/', None
+    if endpoint == 'sign_in':
+        return 'POST', '/api/users/sign_in/', {'email': run.email, 'password': run.password}
+    if endpoint == 'bulk_create':
+        return 'POST', '/api/products/bulk_create/', [run.product(rng) for _ in range(run.args.batch_size)]
+    if endpoint == 'bulk_update':
+        # Sorted so concurrent updates lock rows in the same order.
+        ids = sorted(rng.sample(run.product_ids, min(run.args.batch_size, len(run.product_ids))))
+        return 'PATCH', '/api/products/bulk_update/', [
+            {'id': product_id, 'price': f'{rng.lognormvariate(3.5, 1.0) + 0.01:.2f}'} for product_id in ids
+        ]
+    raise ValueError(endpoint)
+
+
+def worker(run: Run, token: str, index: int, measure_from: float, stop_at: float):
+    rng = random.Random(run.args.seed * 1000 + index)
+    client = Client(run.args.base_url, token)
+    endpoints, weights = zip(*MIX.items())
+    while True:
+        now = time.perf_counter()
+        if now >= stop_at:
+            break
+        endpoint = rng.choices(endpoints, weights)[0]
+        status, seconds, _ = client.request(*scenario(run, rng, endpoint))
+        if now >= measure_from:
+            run.record(endpoint, status, seconds)
+    client.close()
+
+
+def sign_in(run: Run) -> str:
+    client = Client(run.args.base_url)
+    client.request('POST', '/api/users/sign_up/', {
+        'email': run.email, 'username': run.email.split('@')[0], 'first_name': 'Bench', 'last_name': 'User',
+        'password': run.password, 'password2': run.password,
+    })
+    status, _, content = client.request('POST', '/api/users/sign_in/', {'email': run.email, 'password': run.password})
+    client.close()
+    if status != 200:
+        sys.exit(f'Could not sign in as {run.email} (HTTP {status}).')
+    return json.loads(content)['access_token']
+
+
+def find_bench_ids(run: Run, client: Client) -> list:
+    """Ids of the products created by this run, read from the NDJSON export."""
+    prefix = f'bench-{run.run_id}-'
+    status, _, content = client.request('GET', '/api/products/export/?' + urlencode({'name__icontains': prefix}))
+    if status != 200:
+        sys.exit(f'Could not export the benchmark products (HTTP {status}).')
+    rows = [json.loads(line) for line in content.decode().splitlines() if line]
+    # Checked here as well: whatever the filter returns, only this run's products are touched.
+    return [row['id'] for row in rows if row['name'].startswith(prefix)]
+
+
+def setup(run: Run, token: str):
+    client = Client(run.args.base_url, token)
+    rng = random.Random(run.args.seed)
+    products = [run.product(rng) for _ in range(run.args.pool_size)]
+    status, _, _ = client.request('POST', '/api/products/bulk_create/', products)
+    if status != 201:
+        sys.exit(f'Could not create the benchmark products (HTTP {status}).')
+    run.product_ids = find_bench_ids(run, client)
+    client.close()
+    if len(run.product_ids) != len(products):
+        sys.exit(f'Expected {len(products)} benchmark products, found {len(run.product_ids)}.')
+
+
+def cleanup(run: Run, token: str) -> int:
+    """Deletes the products of this run, including those made by bulk_create during the run."""
+    client = Client(run.args.base_url, token)
+    ids = find_bench_ids(run, client)
+    deleted = 0
+    for start in range(0, len(ids), 1000):
+        status, _, content = client.request('POST', '/api/products/bulk_delete/', {'ids': ids[start:start + 1000]})
+        if status != 200:
+            print(f'bulk_delete failed with HTTP {status}: {content[:200]!r}', file=sys.stderr)
+            continue
+        deleted += json.loads(content)['deleted']
+    client.close()
+    if deleted != len(ids):
+        print(f'{len(ids) - deleted} of {len(ids)} benchmark products were not deleted', file=sys.stderr)
+    return deleted
+
+
+def percentile(values: list, percent: float) -> float:
+    """Nearest-rank percentile of sorted ``values``."""
+    return values[max(0, math.ceil(percent / 100 * len(values)) - 1)]
+
+
+def summarize(run: Run, seconds: float) -> dict:
+    endpoints = {}
+    for endpoint in MIX:
+        latencies = sorted(run.latencies.get(endpoint, []))
+        statuses = run.statuses.get(endpoint, Counter())
+        if not latencies:
+            continue
+        endpoints[endpoint] = {
+            'requests': len(latencies),
+            'errors': sum(count for status, count in statuses.items() if not 200 <= status < 400),
+            'throughput_rps': round(len(latencies) / seconds, 2),
+            'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+            'max_ms': round(latencies[-1] * 1000, 2),
+            'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        }
+    requests = sum(item['requests'] for item in endpoints.values())
+    return {
+        'requests': requests,
+        'errors': sum(item['errors'] for item in endpoints.values()),
+        'throughput_rps': round(requests / seconds, 2),
+        'endpoints': endpoints,
+    }
+
+
+def git_commit() -> dict:
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+        dirty = bool(subprocess.check_output(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT))
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': None, 'dirty': None}
+    return {'commit': commit, 'dirty': dirty}
+
+
+def print_report(summary: dict, previous: dict = None):
+    header = f'{"endpoint":<12} {"req":>7} {"err":>5} {"rps":>9} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9}'
+    if previous:
+        header += f' {"Δp95":>8} {"Δrps":>8}'
+    print(header)
+    for endpoint, item in summary['endpoints'].items():
+        line = (
+            f'{endpoint:<12} {item["requests"]:>7} {item["errors"]:>5} {item["throughput_rps"]:>9.1f} '
+            f'{item["p50_ms"]:>9.2f} {item["p95_ms"]:>9.2f} {item["p99_ms"]:>9.2f}'
+        )
+        before = (previous or {}).get('endpoints', {}).get(endpoint)
+        if before:
+            line += (
+                f' {(item["p95_ms"] / before["p95_ms"] - 1) * 100:>+7.1f}%'
+                f' {(item["throughput_rps"] / before["throughput_rps"] - 1) * 100:>+7.1f}%'
+            )
+        print(line)
+    print(f'total {summary["requests"]} requests, {summary["errors"]} errors, {summary["throughput_rps"]:.1f} req/s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--base-url', default='http://localhost:8000')
+    parser.add_argument('--duration', type=float, default=30, help='Measured seconds.')
+    parser.add_argument('--warmup', type=float, default=5, help='Seconds of load before measuring.')
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent client threads.')
+    parser.add_argument('--seed', type=int, default=1, help='Seeds the request mix and parameters.')
+    parser.add_argument('--batch-size', type=int, default=20, help='Products per bulk request.')
+    parser.add_argument('--pool-size', type=int, default=200, help='Products created up front for retrieve.')
+    parser.add_argument('--email', default='bench@example.com')
+    parser.add_argument('--password', default='bench-password')
+    parser.add_argument('--output', help='Result file, benchmarks/results/<commit>-<time>.json by default.')
+    parser.add_argument('--compare', help='Earlier result file to compare against.')
+    args = parser.parse_args()
+
+    run = Run(args)
+    token = sign_in(run)
+    setup(run, token)
+
+    started = time.perf_counter()
+    measure_from = started + args.warmup
+    stop_at = measure_from + args.duration
+    threads = [
+        threading.Thread(target=worker, args=(run, token, index, measure_from, stop_at))
+        for index in range(args.concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    deleted = cleanup(run, token)
+    summary = summarize(run, args.duration)
+    previous = json.loads(Path(args.compare).read_text()) if args.compare else None
+    print_report(summary, previous)
+    print(f'deleted {deleted} benchmark products')
+
+    result = {
+        **git_commit(),
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'base_url': args.base_url,
+        'duration': args.duration,
+        'warmup': args.warmup,
+        'concurrency': args.concurrency,
+        'seed': args.seed,
+        'batch_size': args.batch_size,
+        'mix': MIX,
+        **summary,
+    }
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')
+    output = Path(args.output or ROOT / 'benchmarks' / 'results' / f'{result["commit"] or "unknown"}-{stamp}.json')
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+    print(f'results written to {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Compares the product list serialization paths without touching the database.
+
+Usage:
+    python benchmarks/product_serialization.py [--rows 100] [--repeat 200]
+
+Times ``ProductSerializer(many=True)`` + DRF's ``JSONRenderer`` against the
+``.values()`` fast path + ``FastJSONRenderer`` on identical rows, and checks
+that both produce the same bytes.
+"""
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime, timezone
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Product.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from apps.products.models import Category, Product  # noqa: E402
+from apps.products.serializers import ProductSerializer, ProductValuesSerializer  # noqa: E402
+from services.rendering.renderers import FastJSONRenderer  # noqa: E402
+
+
+def make_rows(count: int) -> list:
+    categories = Category.values
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            'id': index,
+            'created_at': now,
+            'name': f'Продукт {index}',
+            'description': 'Описание продукта ' * (index % 20),
+            'price': Decimal(index * 37 % 10000) / 100 + Decimal('0.01'),
+            'category': categories[index % len(categories)],
+            'image': f'products/{index}.jpg' if index % 3 else None,
+            'image_variants': {'thumb': {'jpeg': f'products/variants/{index}_thumb.jpeg'}} if index % 3 else {},
+        }
+        for index in range(1, count + 1)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100, help='Products per page.')
+    parser.add_argument('--repeat', type=int, default=200, help='Pages rendered per measurement.')
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    instances = [Product(**row) for row in rows]
+    stock, fast = JSONRenderer(), FastJSONRenderer()
+
+    def stock_path():
+        return stock.render({'results': ProductSerializer(instances, many=True).data})
+
+    def fast_path():
+        return fast.render({'results': ProductValuesSerializer.many(rows)})
+
+    if stock_path() != fast_path():
+        sys.exit('Fast path output differs from ProductSerializer + JSONRenderer.')
+
+    stock_time = min(timeit.repeat(stock_path, number=args.repeat, repeat=3)) / args.repeat
+    fast_time = min(timeit.repeat(fast_path, number=args.repeat, repeat=3)) / args.repeat
+    print(f'{args.rows} products per page')
+    print(f'ProductSerializer + JSONRenderer:          {stock_time * 1000:8.3f} ms/page')
+    print(f'ProductValuesSerializer + FastJSONRenderer: {fast_time * 1000:8.3f} ms/page')
+    print(f'Speedup: {stock_time / fast_time:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -14,7 +14,17 @@ git pull
 export DJANGO_SETTINGS_MODULE=Product.settings
 python manage.py migrate
 python manage.py collectstatic --no-input
-gunicorn -w 7 -b 0.0.0.0:8000 Product.wsgi --reload
+# Worker processes share Prometheus metrics through files in this directory.
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}"
+rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+if [ "$SERVER_MODE" = "asgi" ]
+then
+    # Async views: each worker keeps many reads in flight on one event loop.
+    uvicorn Product.asgi:application --host 0.0.0.0 --port 8000 \
+        --workers "${ASGI_WORKERS:-2}" --limit-concurrency "${ASGI_LIMIT_CONCURRENCY:-1000}"
+else
+    gunicorn -w 7 -b 0.0.0.0:8000 Product.wsgi --reload
+fi
 
 
 exec "$@"
\ No newline at end of file
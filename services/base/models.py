@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 
 class TimeStampModel(models.Model):
@@ -7,3 +8,42 @@ class TimeStampModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+# Condition of the partial indexes of soft-deleted models: only live rows are indexed.
+ALIVE = models.Q(deleted_at__isnull=True)
+
+
+class SoftDeleteQuerySet(models.QuerySet):
+
+    def soft_delete(self) -> int:
+        """Marks the live rows of the queryset deleted with one UPDATE."""
+        now = timezone.now()
+        return self.filter(ALIVE).update(deleted_at=now, updated_at=now)
+
+    def restore(self) -> int:
+        """Brings back the soft-deleted rows of the queryset that were not purged yet."""
+        return self.filter(deleted_at__isnull=False).update(deleted_at=None, updated_at=timezone.now())
+
+
+class SoftDeleteManager(models.Manager):
+    """Default manager of soft-deleted models, hides deleted rows."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(ALIVE)
+
+
+class SoftDeleteModel(TimeStampModel):
+    """TimeStampModel whose rows are soft-deleted by the services.
+
+    A delete only sets ``deleted_at``; ``objects`` hides such rows and
+    ``all_objects`` still sees them. The ``purge_deleted`` command removes
+    them for good once ``SOFT_DELETE_RETENTION_DAYS`` have passed.
+    """
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = SoftDeleteManager.from_queryset(SoftDeleteQuerySet)()
+    all_objects = SoftDeleteQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
@@ -0,0 +1,53 @@
+from typing import Iterable, Optional, Tuple
+
+from drf_yasg import openapi
+from rest_framework import serializers
+
+FIELDS_QUERY_PARAM = 'fields'
+
+
+def get_requested_fields(request, allowed: Iterable[str]) -> Optional[Tuple[str, ...]]:
+    """Parses the ``fields`` query parameter of a sparse fieldset request.
+
+    Args:
+        request: The DRF request.
+        allowed: Field names the endpoint can render, in output order.
+
+    Returns:
+        The requested fields in the order of ``allowed``, or None when the
+        parameter is absent and every field should be rendered.
+
+    Raises:
+        serializers.ValidationError: If an unknown field is requested.
+    """
+    value = request.query_params.get(FIELDS_QUERY_PARAM)
+    if value is None:
+        return None
+    requested = {name.strip() for name in value.split(',') if name.strip()}
+    allowed = tuple(allowed)
+    unknown = sorted(requested.difference(allowed))
+    if unknown:
+        raise serializers.ValidationError({FIELDS_QUERY_PARAM: [f"Unknown field(s): {', '.join(unknown)}."]})
+    if not requested:
+        return None
+    return tuple(name for name in allowed if name in requested)
+
+
+def fields_parameter(allowed: Iterable[str]) -> openapi.Parameter:
+    """Swagger description of the ``fields`` query parameter."""
+    return openapi.Parameter(
+        FIELDS_QUERY_PARAM,
+        openapi.IN_QUERY,
+        description=f"Comma separated subset of fields to return: {', '.join(allowed)}.",
+        type=openapi.TYPE_STRING,
+    )
+
+
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    """ModelSerializer that renders only the fields passed in the ``fields`` argument."""
+
+    def __init__(self, *args, fields: Optional[Iterable[str]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields).difference(fields):
+                self.fields.pop(name)
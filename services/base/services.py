@@ -1,8 +1,58 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.db.models.sql import UpdateQuery
+from django.utils import timezone
 from django.http import JsonResponse
 from rest_framework import serializers, status
-from typing import Type, Dict, Any
+from typing import Type, Dict, Any, List, Iterable, Optional
+
+from services.base.models import SoftDeleteModel
+from services.base.versioning import Conflict
+
+
+class UnitOfWork:
+    """Identity map of the model instances loaded during one request.
+
+    ``BaseService.get_by_id`` hands back an instance already loaded in the
+    current request instead of querying the same row again. Writes through
+    the services keep the map in step with the database.
+    """
+
+    def __init__(self):
+        self.instances: Dict[tuple, models.Model] = {}
+
+    @staticmethod
+    def key(model: Type[models.Model], object_id) -> tuple:
+        # Ids from URLs arrive as strings, ids from the ORM as ints.
+        return model, str(object_id)
+
+    def get(self, model: Type[models.Model], object_id) -> Optional[models.Model]:
+        return self.instances.get(self.key(model, object_id))
+
+    def add(self, obj: models.Model) -> None:
+        self.instances[self.key(type(obj), obj.pk)] = obj
+
+    def discard(self, model: Type[models.Model], object_id) -> None:
+        self.instances.pop(self.key(model, object_id), None)
+
+
+unit_of_work: ContextVar[Optional[UnitOfWork]] = ContextVar('unit_of_work', default=None)
+
+
+@contextmanager
+def unit_of_work_scope():
+    """Opens a fresh identity map for the duration of the block, e.g. one request."""
+    token = unit_of_work.set(UnitOfWork())
+    try:
+        yield
+    finally:
+        unit_of_work.reset(token)
 
 
 class BaseService:
@@ -56,28 +106,129 @@ class BaseService:
         Raises:
             ValidationError: If the instance does not exist.
         """
+        obj = cls.get_remembered(object_id)
+        if obj is not None:
+            return obj
         try:
             objects = cls.model.objects.get(pk=object_id)
         except cls.model.DoesNotExist:
             raise serializers.ValidationError(f"{cls.model.__name__} does not exist.")
-        return objects
+        return cls.remember(objects)
+
+    @classmethod
+    async def aget_by_id(cls, object_id: int):
+        """Async counterpart of ``get_by_id``.
+
+        Raises:
+            ValidationError: If the instance does not exist.
+        """
+        obj = cls.get_remembered(object_id)
+        if obj is not None:
+            return obj
+        try:
+            return cls.remember(await cls.model.objects.aget(pk=object_id))
+        except cls.model.DoesNotExist:
+            raise serializers.ValidationError(f"{cls.model.__name__} does not exist.")
+
+    @classmethod
+    def get_remembered(cls, object_id: int):
+        """Returns the instance already loaded in the current unit of work, if any."""
+        work = unit_of_work.get()
+        return work.get(cls.model, object_id) if work is not None else None
 
     @classmethod
-    def update(cls, object_id: int, **kwargs: Dict[str, Any]):
-        """Updates an existing instance of the model.
+    def remember(cls, obj: models.Model) -> models.Model:
+        """Adds an instance loaded elsewhere, e.g. ``request.user``, to the current unit of work."""
+        work = unit_of_work.get()
+        if work is not None:
+            work.add(obj)
+        return obj
+
+    @classmethod
+    def forget(cls, *object_ids: int) -> None:
+        work = unit_of_work.get()
+        if work is not None:
+            for object_id in object_ids:
+                work.discard(cls.model, object_id)
+
+    @classmethod
+    def update(cls, object_id: int, expected_version: datetime = None, **kwargs: Dict[str, Any]):
+        """Updates an existing instance with one ``UPDATE`` of the changed columns.
+
+        Only the given fields and the ``auto_now`` timestamps are written. On
+        PostgreSQL the new row comes back through ``RETURNING``; elsewhere the
+        changes are applied to the instance loaded earlier in the request, or
+        the row is read again.
 
         Args:
             object_id: The ID of the model instance to update.
+            expected_version: The ``updated_at`` the caller last saw. The row is
+                only updated if it still has this value.
             **kwargs: Field names and values to update.
 
         Returns:
             The updated model instance.
+
+        Raises:
+            ValidationError: If the instance does not exist.
+            Conflict: If the instance changed since ``expected_version``.
         """
-        obj = cls.get_by_id(object_id)
-        for attr, value in kwargs.items():
-            setattr(obj, attr, value)
-        obj.save()
-        return obj
+        db = router.db_for_write(cls.model)
+        manager = cls.model._default_manager.db_manager(db)
+        values = cls.get_update_values(object_id, kwargs)
+        queryset = manager.filter(pk=object_id)
+        if expected_version is not None:
+            queryset = queryset.filter(updated_at=expected_version)
+
+        if connections[db].vendor == 'postgresql':
+            rows = list(cls.update_returning(queryset, values))
+            obj = rows[0] if rows else None
+        elif queryset.update(**values):
+            obj = cls.get_remembered(object_id)
+            if obj is None:
+                # The base manager also sees rows that this update soft-deleted.
+                obj = cls.model._base_manager.db_manager(db).get(pk=object_id)
+            else:
+                for attname, value in values.items():
+                    setattr(obj, attname, value)
+        else:
+            obj = None
+
+        if obj is None:
+            cls.forget(object_id)
+            if expected_version is not None and manager.filter(pk=object_id).exists():
+                raise Conflict()
+            raise serializers.ValidationError(f"{cls.model.__name__} does not exist.")
+        return cls.remember(obj)
+
+    @classmethod
+    async def aupdate(cls, object_id: int, expected_version: datetime = None, **kwargs: Dict[str, Any]):
+        """Async counterpart of ``update``."""
+        return await sync_to_async(cls.update)(object_id, expected_version, **kwargs)
+
+    @classmethod
+    def get_update_values(cls, object_id: int, changes: Dict[str, Any]) -> Dict[str, Any]:
+        """Column values for ``update``, keyed by attname.
+
+        ``pre_save()`` runs on a scratch instance, so uploaded files are stored
+        and ``auto_now`` fields are set just as ``save()`` would do.
+        """
+        scratch = cls.model(pk=object_id)
+        fields = [cls.model._meta.get_field(name) for name in changes]
+        fields += [f for f in cls.model._meta.concrete_fields if getattr(f, 'auto_now', False) and f not in fields]
+        for name, value in changes.items():
+            setattr(scratch, name, value)
+        return {field.attname: field.pre_save(scratch, add=False) for field in fields}
+
+    @staticmethod
+    def update_returning(queryset: models.QuerySet, values: Dict[str, Any]) -> models.query.RawQuerySet:
+        """``queryset.update(**values)`` that also returns the updated rows, for PostgreSQL."""
+        query = queryset.query.chain(UpdateQuery)
+        query.add_update_values(values)
+        sql, params = query.get_compiler(queryset.db).as_sql()
+        connection = connections[queryset.db]
+        columns = ', '.join(connection.ops.quote_name(f.column) for f in queryset.model._meta.concrete_fields)
+        return queryset.model._default_manager.db_manager(queryset.db).raw(f'{sql} RETURNING {columns}', params)
 
     @classmethod
     def delete(cls, object_id: int) -> JsonResponse:
@@ -89,10 +240,128 @@ class BaseService:
         Returns:
             JsonResponse: A response indicating success.
         """
-        obj = cls.get_by_id(object_id)
-        obj.delete()
+        cls.remove(object_id)
         return JsonResponse({"message": f"{cls.model.__name__} deleted successfully."}, status=status.HTTP_200_OK)
 
+    @classmethod
+    def soft_deletes(cls) -> bool:
+        return issubclass(cls.model, SoftDeleteModel)
+
+    @classmethod
+    def remove(cls, object_id: int) -> models.Model:
+        """Deletes one instance and returns it.
+
+        Instances of SoftDeleteModel subclasses are only marked deleted, with a
+        single UPDATE that does not load the row first.
+
+        Raises:
+            ValidationError: If the instance does not exist.
+        """
+        if cls.soft_deletes():
+            obj = cls.update(object_id, deleted_at=timezone.now())
+        else:
+            obj = cls.get_by_id(object_id)
+            obj.delete()
+        cls.forget(object_id)
+        return obj
+
+    @classmethod
+    def restore(cls, object_id: int) -> models.Model:
+        """Brings back a soft-deleted instance that was not purged yet.
+
+        Raises:
+            ValidationError: If there is no such soft-deleted instance.
+        """
+        if not cls.soft_deletes() or not cls.model.all_objects.filter(pk=object_id).restore():
+            raise serializers.ValidationError(f"Deleted {cls.model.__name__} does not exist.")
+        return cls.get_by_id(object_id)
+
+    @classmethod
+    @transaction.atomic
+    def bulk_create(cls, objects: List[Dict[str, Any]], batch_size: int = None) -> List[models.Model]:
+        """Creates many instances with batched INSERTs in one transaction.
+
+        Args:
+            objects: Field names and values for each new instance.
+            batch_size: Rows per INSERT, ``BULK_BATCH_SIZE`` by default.
+
+        Returns:
+            The created model instances, in input order.
+        """
+        instances = [cls.model(**kwargs) for kwargs in objects]
+        return cls.model.objects.bulk_create(instances, batch_size=batch_size or settings.BULK_BATCH_SIZE)
+
+    @classmethod
+    @transaction.atomic
+    def bulk_update(cls, objects: List[Dict[str, Any]], batch_size: int = None) -> List[models.Model]:
+        """Updates many instances with batched UPDATEs in one transaction.
+
+        Args:
+            objects: Field names and values to update, each with the ``id`` of its instance.
+            batch_size: Rows per UPDATE, ``BULK_BATCH_SIZE`` by default.
+
+        Returns:
+            The updated model instances, in input order.
+
+        Raises:
+            ValidationError: If any of the instances does not exist. The detail
+                holds one entry per item, in input order, like the errors of a
+                ``many=True`` serializer; items that exist get an empty one.
+        """
+        changes = [dict(item) for item in objects]
+        ids = [item.pop('id') for item in changes]
+        instances = cls.model.objects.in_bulk(ids)
+        if len(instances) < len(set(ids)):
+            raise serializers.ValidationError([
+                {} if object_id in instances else {'id': [f"{cls.model.__name__} does not exist."]}
+                for object_id in ids
+            ])
+
+        fields = {attr for item in changes for attr in item}
+        # bulk_update() skips save(), so auto_now fields have to be set here.
+        auto_now = [f for f in cls.model._meta.concrete_fields if getattr(f, 'auto_now', False)]
+        fields.update(f.name for f in auto_now)
+
+        updated = []
+        for object_id, item in zip(ids, changes):
+            obj = instances[object_id]
+            for attr, value in item.items():
+                setattr(obj, attr, value)
+            for field in auto_now:
+                field.pre_save(obj, add=False)
+            updated.append(obj)
+
+        if fields:
+            cls.model.objects.bulk_update(
+                list(instances.values()), list(fields), batch_size=batch_size or settings.BULK_BATCH_SIZE
+            )
+        for obj in updated:
+            cls.remember(obj)
+        return updated
+
+    @classmethod
+    @transaction.atomic
+    def bulk_delete(cls, object_ids: Iterable[int], batch_size: int = None) -> int:
+        """Deletes many instances with ``DELETE ... WHERE id IN`` batches in one transaction.
+
+        SoftDeleteModel instances are marked deleted with ``UPDATE`` batches instead.
+
+        Args:
+            object_ids: The IDs of the model instances to delete.
+            batch_size: IDs per DELETE, ``BULK_BATCH_SIZE`` by default.
+
+        Returns:
+            int: The number of deleted rows.
+        """
+        object_ids = list(object_ids)
+        batch_size = batch_size or settings.BULK_BATCH_SIZE
+        deleted = 0
+        for start in range(0, len(object_ids), batch_size):
+            queryset = cls.model.objects.filter(pk__in=object_ids[start:start + batch_size])
+            deleted += queryset.soft_delete() if cls.soft_deletes() else queryset.delete()[0]
+        cls.forget(*object_ids)
+        return deleted
+
     @classmethod
     def filter(cls, parameters: Dict[str, Any], prefetch_: list, select_: list) -> models.QuerySet:
         """Filters model instances based on given parameters.
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal, InvalidOperation
+from typing import Optional
+
+from drf_yasg import openapi
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class Conflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The object was modified by another request, fetch it again and retry.'
+    default_code = 'conflict'
+
+
+def version_etag(object_id, updated_at: datetime) -> str:
+    """ETag of one object version: its id and ``updated_at`` timestamp."""
+    return f'{object_id}-{updated_at.timestamp()}'
+
+
+def get_expected_version(request, object_id) -> Optional[datetime]:
+    """Reads the ``updated_at`` the client last saw from its ``If-Match`` header.
+
+    The header carries the ETag returned by GET or by a previous update. The
+    ``fields`` suffix of a sparse fieldset ETag is ignored.
+
+    Args:
+        request: The DRF request.
+        object_id: ID of the object being updated.
+
+    Returns:
+        The expected ``updated_at``, or None when the client did not ask for a
+        version check.
+
+    Raises:
+        Conflict: If the ETag belongs to another object or is malformed, so it
+            can never match.
+    """
+    value = request.headers.get('If-Match', '').strip()
+    if not value or value == '*':
+        return None
+    etag = value.removeprefix('W/').strip('"')
+    try:
+        etag_id, timestamp = etag.split('-')[:2]
+        # Decimal keeps the microseconds exact, a float round trip may not.
+        microseconds = int((Decimal(timestamp) * 10 ** 6).to_integral_value())
+    except (ValueError, InvalidOperation):
+        raise Conflict()
+    if etag_id != str(object_id):
+        raise Conflict()
+    return EPOCH + timedelta(microseconds=microseconds)
+
+
+IF_MATCH_PARAMETER = openapi.Parameter(
+    'If-Match',
+    openapi.IN_HEADER,
+    description='ETag of the version being modified; a stale one is rejected with 409 Conflict.',
+    type=openapi.TYPE_STRING,
+    required=False,
+)
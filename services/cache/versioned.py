@@ -0,0 +1,84 @@
+import hashlib
+from typing import Any
+
+from django.core.cache import caches
+
+_MISSING = object()
+
+
+class VersionedCache:
+    """Response cache invalidated by bumping a per-namespace version counter.
+
+    Every key embeds the current version, so invalidating the whole namespace
+    is a single ``incr`` instead of a scan over keys; stale entries simply
+    stop being read and expire on their own. The backend has to be shared by
+    all processes (Redis, Memcached), or a bump only reaches the process that
+    made it.
+
+    Attributes:
+        namespace: Prefix shared by all keys, usually the model name.
+        alias: Name of the Django cache backend in ``CACHES``.
+        timeout: Lifetime of cached entries in seconds.
+    """
+
+    def __init__(self, namespace: str, alias: str = 'default', timeout: int = 300):
+        self.namespace = namespace
+        self.alias = alias
+        self.timeout = timeout
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _key(self, name: str) -> str:
+        return f'{self.namespace}:{name}'
+
+    def version(self) -> int:
+        key = self._key('version')
+        version = self.cache.get(key)
+        if version is None:
+            self.cache.add(key, 1, timeout=None)
+            version = self.cache.get(key, 1)
+        return version
+
+    def bump(self) -> None:
+        """Invalidates every entry of the namespace."""
+        key = self._key('version')
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            self.cache.add(key, 2, timeout=None)
+
+    def make_key(self, *parts: Any) -> str:
+        digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+        return self._key(f'v{self.version()}:{digest}')
+
+    def request_key(self, action: str, request, *parts: Any) -> str:
+        """Builds a key from the action and normalized query parameters of a request."""
+        params = sorted((name, tuple(values)) for name, values in request.query_params.lists())
+        return self.make_key(action, request.get_host(), request.path, params, *parts)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self.cache.get(key, _MISSING)
+        self._count('hits' if value is not _MISSING else 'misses')
+        return default if value is _MISSING else value
+
+    def set(self, key: str, value: Any, timeout: int = None) -> None:
+        """Stores an entry for ``timeout`` seconds, the namespace's ``timeout`` by default."""
+        self.cache.set(key, value, timeout=self.timeout if timeout is None else timeout)
+
+    def _count(self, name: str) -> None:
+        key = self._key(name)
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            if not self.cache.add(key, 1, timeout=None):
+                self.cache.incr(key)
+
+    def stats(self) -> dict:
+        values = self.cache.get_many([self._key('hits'), self._key('misses')])
+        return {
+            'version': self.version(),
+            'hits': values.get(self._key('hits'), 0),
+            'misses': values.get(self._key('misses'), 0),
+        }
@@ -0,0 +1,81 @@
+from typing import Optional
+
+from django.db import connections
+
+from services.metrics.metrics import DB_POOL_STATS, get_registry
+
+# Per-process statistics exported as DB_POOL_STATS gauges; they add up over the processes.
+SUMMED_STATS = (
+    'min_size', 'max_size', 'size', 'available', 'in_use', 'waiting', 'requests', 'queued_requests',
+    'checkout_wait_ms', 'checkout_errors', 'usage_ms', 'connections_opened', 'connections_lost', 'saturated',
+)
+
+
+def get_pool_stats(alias: str) -> Optional[dict]:
+    """Returns connection pool statistics of a database alias for this process.
+
+    Args:
+        alias: The database alias.
+
+    Returns:
+        The pool statistics, or None when the alias is not pooled.
+    """
+    pool = getattr(connections[alias], 'pool', None)
+    if pool is None:
+        return None
+    # Counters only appear in get_stats() once they are non-zero.
+    stats = pool.get_stats()
+    requests = stats.get('requests_num', 0)
+    wait_ms = stats.get('requests_wait_ms', 0)
+    in_use = stats['pool_size'] - stats['pool_available']
+    return {
+        'min_size': stats['pool_min'],
+        'max_size': stats['pool_max'],
+        'size': stats['pool_size'],
+        'available': stats['pool_available'],
+        'in_use': in_use,
+        'waiting': stats['requests_waiting'],
+        'requests': requests,
+        'queued_requests': stats.get('requests_queued', 0),
+        'checkout_wait_ms': wait_ms,
+        'avg_checkout_wait_ms': wait_ms / requests if requests else 0.0,
+        'checkout_errors': stats.get('requests_errors', 0),
+        'usage_ms': stats.get('usage_ms', 0),
+        'connections_opened': stats.get('connections_num', 0),
+        'connections_lost': stats.get('connections_lost', 0),
+        # Every connection is checked out and requests queue for the next one.
+        'saturated': stats['requests_waiting'] > 0 or in_use >= stats['pool_max'],
+    }
+
+
+def get_all_pool_stats() -> dict:
+    """Returns pool statistics of every pooled database alias."""
+    stats = {alias: get_pool_stats(alias) for alias in connections}
+    return {alias: value for alias, value in stats.items() if value is not None}
+
+
+def export_pool_stats() -> None:
+    """Copies the pool statistics of this process into the DB_POOL_STATS gauges."""
+    for alias, stats in get_all_pool_stats().items():
+        for name in SUMMED_STATS:
+            DB_POOL_STATS.labels(alias, name).set(stats[name])
+
+
+def get_deployment_pool_stats() -> dict:
+    """Returns pool statistics of every pooled alias, summed over all worker processes.
+
+    Each process exports its own numbers when it serves a request, so an idle
+    worker reports the state of its last request. ``saturated`` is the number
+    of saturated processes.
+    """
+    export_pool_stats()
+    stats = {}
+    for metric in get_registry().collect():
+        if metric.name != 'db_pool_stats':
+            continue
+        for sample in metric.samples:
+            stats.setdefault(sample.labels['alias'], {})[sample.labels['stat']] = sample.value
+    for values in stats.values():
+        requests = values.get('requests', 0)
+        values['avg_checkout_wait_ms'] = values.get('checkout_wait_ms', 0) / requests if requests else 0.0
+    return stats
@@ -0,0 +1,60 @@
+import random
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+@dataclass
+class RoutingState:
+    """Replica routing state of the current request.
+
+    Attributes:
+        pinned: Reads go to the primary for the rest of the request.
+        wrote: The request wrote to the primary.
+        replica_read: A read of the request was served by a replica.
+    """
+    pinned: bool = False
+    wrote: bool = False
+    replica_read: bool = False
+
+
+# Set by ReplicaPinMiddleware for the duration of a request. Outside requests
+# (management commands, workers) it is None and everything uses the primary.
+routing_state: ContextVar[Optional[RoutingState]] = ContextVar('routing_state', default=None)
+
+
+def served_by_replica() -> bool:
+    """Whether the current request read from a replica, which may lag behind the primary."""
+    state = routing_state.get()
+    return state is not None and state.replica_read
+
+
+class PrimaryReplicaRouter:
+    """Sends reads of unpinned requests to a random replica and everything else to the primary.
+
+    A request is pinned when it is not a safe method, when its client wrote
+    within ``REPLICA_PIN_SECONDS`` (see ReplicaPinMiddleware), or from its
+    first write on. Reads inside a transaction always use the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = routing_state.get()
+        if not settings.DATABASE_REPLICAS or state is None or state.pinned:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        state.replica_read = True
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        state = routing_state.get()
+        if state is not None:
+            state.pinned = state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
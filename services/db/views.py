@@ -0,0 +1,19 @@
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from services.db.pool import get_deployment_pool_stats
+
+
+class PoolStatsView(APIView):
+    permission_classes = [IsAdminUser]
+    swagger_tags = ["Database"]
+
+    @swagger_auto_schema(
+        operation_description='Returns the database connection pool statistics summed over all worker processes.',
+        responses={200: 'Pool statistics per database alias.'}
+    )
+    def get(self, request):
+        return Response(get_deployment_pool_stats(), status=status.HTTP_200_OK)
@@ -0,0 +1,51 @@
+import os
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, multiprocess
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'Request latency by route.',
+    ['route', 'method', 'status'],
+)
+REQUEST_SQL_QUERIES = Histogram(
+    'http_request_sql_queries',
+    'SQL statements executed per request by route.',
+    ['route'],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 200),
+)
+REQUEST_SQL_DURATION = Histogram(
+    'http_request_sql_duration_seconds',
+    'Total SQL execution time per request by route.',
+    ['route'],
+)
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes',
+    'Response body size by route.',
+    ['route'],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+)
+REQUEST_N_PLUS_ONE = Counter(
+    'http_request_n_plus_one',
+    'Requests that repeated one query shape at least N_PLUS_ONE_THRESHOLD times.',
+    ['route'],
+)
+THROTTLE_DECISIONS = Counter(
+    'http_throttle_decisions',
+    'Rate limit checks by throttle scope and result (allowed or rejected).',
+    ['scope', 'result'],
+)
+DB_POOL_STATS = Gauge(
+    'db_pool_stats',
+    'Database connection pool statistics by alias, summed over the live worker processes.',
+    ['alias', 'stat'],
+    multiprocess_mode='livesum',
+)
+
+
+def get_registry():
+    """The registry to read metrics from, aggregated over all worker processes when multiprocess mode is set up."""
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
@@ -0,0 +1,65 @@
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from django.db.backends.signals import connection_created
+
+# `IN (%s, %s, ...)` lists differ only by length between near-identical queries.
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+
+
+@dataclass
+class QueryLog:
+    """SQL statements executed during one request.
+
+    Attributes:
+        count: Number of executed statements.
+        duration: Total time spent executing them, in seconds.
+        shapes: How often each normalized statement ran.
+    """
+    count: int = 0
+    duration: float = 0.0
+    shapes: Counter = field(default_factory=Counter)
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Statements that ran at least ``threshold`` times, a probable N+1."""
+        return [(sql, count) for sql, count in self.shapes.most_common() if count >= threshold]
+
+
+# Set by RequestMetricsMiddleware; a context variable so that queries run in
+# sync_to_async threads of async views are recorded too.
+query_log: ContextVar[Optional[QueryLog]] = ContextVar('query_log', default=None)
+
+
+def normalize(sql: str) -> str:
+    return _IN_LIST.sub('IN (...)', sql)
+
+
+def record_query(execute, sql, params, many, context):
+    """``connection.execute_wrapper`` that adds each statement to the current request's QueryLog."""
+    log = query_log.get()
+    if log is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        log.count += 1
+        log.duration += time.perf_counter() - started
+        log.shapes[normalize(sql)] += 1
+
+
+def install_query_recorder(connection) -> None:
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    # Connections are per thread and alias, so the wrapper is added to each as it connects.
+    install_query_recorder(connection)
+
+
+connection_created.connect(_on_connection_created)
@@ -0,0 +1,17 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from services.db.pool import export_pool_stats
+from services.metrics.metrics import get_registry
+
+
+def metrics_view(request):
+    """Prometheus text-format metrics, aggregated over all worker processes when multiprocess mode is set up."""
+    token = settings.METRICS_TOKEN
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponseForbidden()
+    export_pool_stats()
+    return HttpResponse(generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,86 @@
+import hashlib
+
+from rest_framework.throttling import SimpleRateThrottle
+
+from services.metrics.metrics import THROTTLE_DECISIONS
+
+
+class SlidingWindowRateThrottle(SimpleRateThrottle):
+    """Sliding-window counter over the shared cache.
+
+    DRF's SimpleRateThrottle keeps a list of timestamps that every process
+    reads and rewrites, so concurrent workers lose each other's hits. Here
+    each fixed window has a counter bumped with an atomic ``incr``. The
+    previous window is weighted by how much of it still overlaps the sliding
+    window. With a shared cache backend (Redis, Memcached) the limit holds
+    across all worker processes.
+
+    Rejected requests are counted too, so a client that keeps retrying stays
+    blocked rather than getting a fresh allowance every window.
+    """
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        now = self.timer()
+        window, position = divmod(now, self.duration)
+        current_key = f'{self.key}:{int(window)}'
+        previous_key = f'{self.key}:{int(window) - 1}'
+        # Two windows are needed: the current one and the one being weighted.
+        self.cache.add(current_key, 0, timeout=self.duration * 2)
+        try:
+            current = self.cache.incr(current_key)
+        except ValueError:
+            # Evicted between add() and incr().
+            self.cache.set(current_key, 1, timeout=self.duration * 2)
+            current = 1
+        previous = self.cache.get(previous_key, 0)
+
+        estimate = previous * (1 - position / self.duration) + current
+        allowed = estimate <= self.num_requests
+        self.wait_seconds = None if allowed else self.duration - position
+        THROTTLE_DECISIONS.labels(self.scope, 'allowed' if allowed else 'rejected').inc()
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+    @staticmethod
+    def hash_ident(value: str) -> str:
+        # Keeps emails and other personal data out of cache keys.
+        return hashlib.sha1(value.encode()).hexdigest()
+
+
+class AuthIPRateThrottle(SlidingWindowRateThrottle):
+    """Sign-in and sign-up attempts per client address."""
+    scope = 'auth_ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class AuthEmailRateThrottle(SlidingWindowRateThrottle):
+    """Sign-in and sign-up attempts per email, whatever address they come from."""
+    scope = 'auth_email'
+
+    def get_cache_key(self, request, view):
+        email = request.data.get('email') if hasattr(request.data, 'get') else None
+        if not isinstance(email, str) or not email.strip():
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': self.hash_ident(email.strip().lower())}
+
+
+class UserWriteRateThrottle(SlidingWindowRateThrottle):
+    """Write requests per authenticated user, or per address for anonymous clients."""
+    scope = 'write'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = f'user:{request.user.pk}'
+        else:
+            ident = f'ip:{self.get_ident(request)}'
+        return self.cache_format % {'scope': self.scope, 'ident': ident}